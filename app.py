@@ -1,9 +1,14 @@
 import streamlit as st
-import yfinance as yf
-import feedparser
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import pandas as pd
+import formulas
+import market_data
+import metrics
+import symbol_index
+import watchlist_store
+from news import NEWS_TIMEOUT
 import os
-import json
+import math
 from datetime import datetime
 
 # [요청 7] "지수 종목 확인" -> "데이터모니터링" 으로 변경
@@ -42,23 +47,17 @@ SEARCH_DB = {
     "HD현대일렉트릭": "267260.KS", "삼성전자": "005930.KS", "SK하이닉스": "000660.KS", "알테오젠": "196170.KQ"
 }
 
-TICKERS_FILE = "my_tickers.json"
-
-def load_tickers():
-    if os.path.exists(TICKERS_FILE):
-        with open(TICKERS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    else:
-        return {k: v for k, v in SEARCH_DB.items() if k in [
-            "한국형변동성지수 (VKOSPI)", "VIX (공포지수)", "필라델피아 반도체 (SOX)", "NASDAQ Biotechnology (NBI)", 
-            "장단기금리차 (T10Y2Y)", "삼성전자", "SK하이닉스", "한화에어로스페이스", "알테오젠", "NVDA (엔비디아)"
-        ]}
-
-def save_tickers(tickers_dict):
-    with open(TICKERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(tickers_dict, f, ensure_ascii=False, indent=4)
-
-if 'tickers' not in st.session_state: st.session_state.tickers = load_tickers()
+# 처음 실행할 때(저장소도 my_tickers.json 도 없을 때) 기본 목록
+DEFAULT_TICKERS = {k: v for k, v in SEARCH_DB.items() if k in [
+    "한국형변동성지수 (VKOSPI)", "VIX (공포지수)", "필라델피아 반도체 (SOX)", "NASDAQ Biotechnology (NBI)", 
+    "장단기금리차 (T10Y2Y)", "삼성전자", "SK하이닉스", "한화에어로스페이스", "알테오젠", "NVDA (엔비디아)"
+]}
+
+# 관심종목은 watchlist_store(SQLite) 에 목록별로 저장하고, 세션에는 현재 목록만 올려 둠
+if 'active_list' not in st.session_state:
+    watchlist_store.ensure_default(DEFAULT_TICKERS)
+    st.session_state.active_list = watchlist_store.DEFAULT_LIST
+if 'tickers' not in st.session_state: st.session_state.tickers = watchlist_store.load(st.session_state.active_list)
 if 'market_data' not in st.session_state: st.session_state.market_data = {}
 if 'last_update' not in st.session_state: st.session_state.last_update = "아직 업데이트되지 않음"
 if 'news_data' not in st.session_state: st.session_state.news_data = {}
@@ -67,96 +66,43 @@ if 'form_name' not in st.session_state: st.session_state.form_name = ""
 if 'form_ticker' not in st.session_state: st.session_state.form_ticker = ""
 if 'input_key' not in st.session_state: st.session_state.input_key = 0
 
-# --- [요청 2] PEG 자체 계산식 완벽 코딩 ---
-@st.cache_data(ttl=60)
-def fetch_single_stock(ticker):
-    try:
-        if ticker == "CALC_T10Y2Y":
-            tnx = yf.Ticker("^TNX").history(period="5d")
-            us2y = yf.Ticker("^US2Y").history(period="5d")
-            if not tnx.empty and not us2y.empty:
-                val = tnx['Close'].iloc[-1] - us2y['Close'].iloc[-1]
-                prev = tnx['Close'].iloc[-2] - us2y['Close'].iloc[-2]
-                return float(val), float(val - prev), None
-            return 0.0, 0.0, None
-            
-        if ticker == "CALC_RISKON":
-            spy = yf.Ticker("SPY").history(period="5d")
-            tlt = yf.Ticker("TLT").history(period="5d")
-            if not spy.empty and not tlt.empty:
-                val = spy['Close'].iloc[-1] / tlt['Close'].iloc[-1]
-                prev = spy['Close'].iloc[-2] / tlt['Close'].iloc[-2]
-                chg = ((val - prev) / prev) * 100
-                return float(val), float(chg), None
-            return 0.0, 0.0, None
-
-        stock = yf.Ticker(ticker)
-        hist = stock.history(period="1mo").dropna(subset=['Close'])
-        
-        if len(hist) >= 2:
-            current = float(hist['Close'].iloc[-1])
-            prev = float(hist['Close'].iloc[-2])
-            change = float(((current - prev) / prev) * 100)
-        elif len(hist) == 1:
-            current = float(hist['Close'].iloc[-1])
-            change = 0.0
-        else:
-            return 0.0, 0.0, None
-
-        # PEG 연산 로직 (인터넷 검색 -> 실패 시 PER / EPS 증가율 공식 계산)
-        peg = None
-        is_index = str(ticker).startswith('^') or '=' in str(ticker)
-        
-        if not is_index:
-            try:
-                info = stock.info
-                peg = info.get('pegRatio') or info.get('trailingPegRatio')
-                
-                # 인터넷 API 검색 실패 시, 자체 수식으로 강제 계산
-                if peg is None:
-                    t_eps = info.get('trailingEps') # 전기 EPS
-                    f_eps = info.get('forwardEps')  # 당기 EPS
-                    pe = info.get('trailingPE') or info.get('forwardPE') # PER
-                    
-                    if pe is None and current > 0 and t_eps and t_eps > 0:
-                        pe = current / t_eps # PER = 주가 / EPS
-                        
-                    if t_eps and f_eps and pe and t_eps > 0:
-                        eps_growth = ((f_eps - t_eps) / t_eps) * 100 # EPS 증가율(%)
-                        if eps_growth > 0:
-                            peg = pe / eps_growth # PEG = PER / EPS 증가율
-            except: pass
-
-        return current, change, peg
-    except:
-        return 0.0, 0.0, None
-
-def fetch_all_data():
-    raw_data = {}
-    for name, ticker in st.session_state.tickers.items():
-        raw_price, raw_change, peg = fetch_single_stock(ticker)
-        raw_data[name] = {"raw_price": raw_price, "raw_change": raw_change, "peg": peg}
-    st.session_state.market_data = raw_data
-    st.session_state.last_update = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-def fetch_news():
-    news_list = []
-    urls = [
-        ("한국/특징주", "https://news.google.com/rss/search?q=특징주+주식+경제+when:1d&hl=ko&gl=KR&ceid=KR:ko"),
-        ("Yahoo Macro", "https://finance.yahoo.com/rss/topstories")
-    ]
-    for src, url in urls:
-        try:
-            for entry in feedparser.parse(url).entries[:4]:
-                pub = entry.published[:16] if hasattr(entry, 'published') else ""
-                news_list.append({"source": src, "title": entry.title, "link": entry.link, "date": pub})
-        except: pass
-    st.session_state.news_data = news_list
-
+# 시세/뉴스 수집은 서버 프로세스 공용 폴러가 담당하고, 세션은 발행된 스냅샷만 읽음
+@st.cache_resource
+def get_poller():
+    return market_data.MarketPoller().start()
+
+poller = get_poller()
+
+def register_session():
+    ctx = get_script_run_ctx()
+    poller.register(ctx.session_id if ctx else "local", st.session_state.tickers.values(), st.session_state.tickers.keys())
+
+def read_snapshot(news=True):
+    snap = poller.snapshot
+    rows = st.session_state.market_data
+    # 아직 폴러가 수집하지 못한 신규 종목은 세션에 있던 값을 유지
+    st.session_state.market_data = {
+        name: snap.quotes[t] if t in snap.quotes else rows.get(name, {})
+        for name, t in st.session_state.tickers.items()
+    }
+    hits = sum(t in snap.quotes for t in st.session_state.tickers.values())
+    metrics.cache("snapshot", "hit", hits)
+    metrics.cache("snapshot", "miss", len(st.session_state.tickers) - hits)
+    if news: st.session_state.news_data = list(poller.news.items)
+    st.session_state.last_update = snap.updated_at
+    st.session_state.snapshot_fetched_at = snap.fetched_at
+    st.session_state.snapshot_restored = snap.restored
+
+def refresh_now():
+    register_session()
+    poller.request_refresh(wait=True, timeout=market_data.FETCH_TIMEOUT * 2, force=True)
+    read_snapshot()
+
+register_session()
 if not st.session_state.market_data:
     with st.spinner("데이터모니터링 초기화 및 데이터 수집 중입니다..."):
-        fetch_all_data()
-        fetch_news()
+        poller.ensure(st.session_state.tickers.values())
+read_snapshot()
 
 def force_editor_rebuild():
     if "edit_left" in st.session_state: del st.session_state["edit_left"]
@@ -166,10 +112,20 @@ def handle_add_or_mod():
     n = st.session_state.form_name
     t = st.session_state.form_ticker
     if n and t:
-        st.session_state.tickers[n] = t
-        p, c, peg = fetch_single_stock(t)
+        if formulas.is_formula(t):
+            try: formulas.parse(t)
+            except ValueError as e:
+                st.toast(str(e))
+                return
+        elif not market_data.is_index_ticker(t) and os.path.exists(symbol_index.SYMBOLS_FILE) and symbol_index.get(SEARCH_DB).lookup(t) is None:
+            st.toast(f"⚠️ 종목 색인에 없는 티커입니다: {t} (그대로 추가)")
+        watchlist_store.upsert(st.session_state.active_list, n, t)
+        st.session_state.tickers = watchlist_store.load(st.session_state.active_list)
+        p, c, peg = market_data.fetch_single_stock(t)
+        if not p: st.toast(f"⚠️ {t} 시세를 받지 못했습니다. 진단 패널에서 원인을 확인하세요.")
         st.session_state.market_data[n] = {"raw_price": p, "raw_change": c, "peg": peg}
-        save_tickers(st.session_state.tickers)
+        register_session()
+        poller.request_refresh()
         st.session_state.form_name = ""
         st.session_state.form_ticker = ""
         force_editor_rebuild()
@@ -177,60 +133,94 @@ def handle_add_or_mod():
 def move_items(direction):
     names = st.session_state.checked_items
     if not names: return
-    items = list(st.session_state.tickers.items())
-    if direction == "up":
-        for i in range(1, len(items)):
-            if items[i][0] in names and items[i-1][0] not in names:
-                items[i], items[i-1] = items[i-1], items[i]
-    elif direction == "down":
-        for i in range(len(items)-2, -1, -1):
-            if items[i][0] in names and items[i+1][0] not in names:
-                items[i], items[i+1] = items[i+1], items[i]
-    st.session_state.tickers = dict(items)
-    save_tickers(st.session_state.tickers)
+    watchlist_store.move(st.session_state.active_list, names, direction)
+    st.session_state.tickers = watchlist_store.load(st.session_state.active_list)
     force_editor_rebuild()
 
 def delete_items():
+    watchlist_store.remove(st.session_state.active_list, st.session_state.checked_items)
     for name in st.session_state.checked_items:
-        if name in st.session_state.tickers: del st.session_state.tickers[name]
         if name in st.session_state.market_data: del st.session_state.market_data[name]
+    st.session_state.tickers = watchlist_store.load(st.session_state.active_list)
     st.session_state.checked_items = [] 
-    save_tickers(st.session_state.tickers)
     force_editor_rebuild()
 
+def switch_list(name):
+    st.session_state.active_list = name
+    st.session_state.tickers = watchlist_store.load(name)
+    st.session_state.checked_items = []
+    force_editor_rebuild()
+    register_session()
+    poller.ensure(st.session_state.tickers.values())
+    read_snapshot(news=False)
+
+def on_list_change():
+    switch_list(st.session_state.list_choice)
+
+def create_list():
+    name = st.session_state.new_list_name.strip()
+    if not name: return
+    watchlist_store.create_list(name)
+    st.session_state.new_list_name = ""
+    st.session_state.list_choice = name
+    switch_list(name)
+
+def delete_list():
+    name = st.session_state.active_list
+    if name == watchlist_store.DEFAULT_LIST:
+        st.toast("기본 목록은 삭제할 수 없습니다.")
+        return
+    watchlist_store.delete_list(name)
+    st.session_state.list_choice = watchlist_store.DEFAULT_LIST
+    switch_list(watchlist_store.DEFAULT_LIST)
+
 # [요청 7 반영 확인] 타이틀 변경
 st.title("📱 데이터모니터링")
 st.markdown("<span style='color:gray;'>자율 진화형 퀀트 분석 및 실시간 포트폴리오 스캐닝 시스템</span>", unsafe_allow_html=True)
 
+# 자동고침은 페이지 새로고침 대신 시세 표 영역(fragment)만 주기적으로 다시 그림 (세션/체크 상태 유지)
 refresh_opts = {"끄기": 0, "1분마다": 60, "5분마다": 300, "10분마다": 600}
 col_top1, col_top2, col_top3 = st.columns([1.2, 1, 2])
 with col_top1:
     refresh_sel = st.selectbox("⏱️ 자동고침 설정", list(refresh_opts.keys()), label_visibility="collapsed")
-    if refresh_opts[refresh_sel] > 0:
-        st.markdown(f"<meta http-equiv='refresh' content='{refresh_opts[refresh_sel]}'>", unsafe_allow_html=True)
 with col_top2:
     if st.button("🔄 전체 데이터 갱신", use_container_width=True):
-        fetch_all_data()
-        fetch_news()
+        refresh_now()
         st.rerun()
 with col_top3:
-    st.info(f"마지막 갱신: {st.session_state.last_update}")
+    list_names = watchlist_store.lists()
+    if st.session_state.active_list not in list_names: # 다른 세션에서 지운 목록
+        switch_list(watchlist_store.DEFAULT_LIST if watchlist_store.DEFAULT_LIST in list_names else list_names[0])
+    st.session_state.list_choice = st.session_state.active_list
+    st.selectbox("📂 관심종목 목록", list_names, key="list_choice", on_change=on_list_change, label_visibility="collapsed")
+
+with st.expander("📂 목록 관리", expanded=False):
+    lc1, lc2, lc3 = st.columns([2, 1, 1])
+    lc1.text_input("새 목록 이름", key="new_list_name", placeholder="새 목록 이름", label_visibility="collapsed")
+    lc2.button("➕ 목록 만들기", on_click=create_list, use_container_width=True)
+    lc3.button("🗑️ 현재 목록 삭제", on_click=delete_list, use_container_width=True)
 
 with st.expander("➕ 종목 추가 및 DB 검색", expanded=False):
+    # 검색어가 있을 때만 종목 색인을 읽고, 선택 상자에는 상위 결과만 보냄 (전체 종목 목록은 브라우저로 보내지 않음)
+    query = st.text_input("종목 검색", key="symbol_query", placeholder="🔍 종목명 / 영문명 / 티커 / 초성 (예: 삼성, hynix, 005930, ㅅㅅㅈㅈ)", label_visibility="collapsed")
+    if query:
+        st.session_state.db_choices = {s.label: (s.name, s.ticker) for s in symbol_index.get(SEARCH_DB).search(query)}
+    else:
+        st.session_state.db_choices = {name: (name, t) for name, t in SEARCH_DB.items()}
+
     def on_db_change():
         choice = st.session_state.db_choice
-        if choice != "직접 입력":
-            st.session_state.form_name = choice
-            st.session_state.form_ticker = SEARCH_DB[choice]
+        if choice in st.session_state.db_choices:
+            st.session_state.form_name, st.session_state.form_ticker = st.session_state.db_choices[choice]
         else:
             st.session_state.form_name = ""
             st.session_state.form_ticker = ""
 
-    st.selectbox("DB 선택", ["직접 입력"] + list(SEARCH_DB.keys()), key="db_choice", on_change=on_db_change, label_visibility="collapsed")
+    st.selectbox("DB 선택", ["직접 입력"] + list(st.session_state.db_choices), key="db_choice", on_change=on_db_change, label_visibility="collapsed")
     
     c1, c2 = st.columns(2)
     st.text_input("종목명", key="form_name", placeholder="예: 삼성전자")
-    st.text_input("티커", key="form_ticker", placeholder="예: 005930.KS")
+    st.text_input("티커", key="form_ticker", placeholder="예: 005930.KS 또는 수식 ^TNX - ^US2Y @bp")
     
     bc1, bc2 = st.columns(2)
     bc1.button("➕ 종목 추가", on_click=handle_add_or_mod, use_container_width=True)
@@ -244,45 +234,47 @@ if ctrl1.button("🔼 위로 이동", use_container_width=True): move_items("up"
 if ctrl2.button("🔽 아래로 이동", use_container_width=True): move_items("down"); st.rerun()
 if ctrl3.button("🗑️ 선택 삭제", use_container_width=True): delete_items(); st.rerun()
 
-df_list = []
-for name, ticker in st.session_state.tickers.items():
-    info = st.session_state.market_data.get(name, {})
-    price = info.get("raw_price", 0.0)
-    chg = info.get("raw_change", 0.0)
-    peg = info.get("peg", None)
-    
-    is_kr = str(ticker).upper().endswith('.KS') or str(ticker).upper().endswith('.KQ')
-    price_str = f"{int(price):,}" if is_kr else f"{price:,.2f}"
-    chg_str = f"{chg:+.2f}%" if ticker != "CALC_T10Y2Y" else f"{chg:+.2f}bp"
-    peg_str = f"{peg:.2f}" if peg is not None else "-"
-
-    df_list.append({
-        "✅": name in st.session_state.checked_items, 
-        "항목": name, 
-        "현재가": price_str, 
+UP_STYLE = 'color: #ff4d4d; font-weight: bold;'
+DOWN_STYLE = 'color: #4d94ff; font-weight: bold;'
+FLAT_STYLE = 'color: gray;'
+
+# 표 전체를 열 단위로 한 번에 포맷 (행 단위 루프/Styler.apply(axis=1) 없이)
+def build_quote_frame():
+    tickers = st.session_state.tickers
+    market = st.session_state.market_data
+    names = list(tickers.keys())
+    if not names:
+        return pd.DataFrame(columns=["✅", "항목", "현재가", "등락률", "PEG"]), pd.Series(dtype=str)
+    symbols = pd.Series(list(tickers.values()), dtype=str)
+    raw = pd.DataFrame([dict(market.get(n, {})) for n in names], columns=["raw_price", "raw_change", "peg", "stale"])
+
+    price = pd.to_numeric(raw["raw_price"]).replace([float("inf"), float("-inf")], float("nan")).fillna(0.0)
+    chg = pd.to_numeric(raw["raw_change"]).replace([float("inf"), float("-inf")], float("nan")).fillna(0.0)
+    peg = pd.to_numeric(raw["peg"])
+    is_kr = symbols.str.upper().str.endswith((".KS", ".KQ"))
+
+    price_str = price.map("{:,.2f}".format)
+    price_str[is_kr] = price[is_kr].astype("int64").map("{:,}".format) # 원화 종목만 정수 표시
+    price_str = price_str + raw["stale"].eq(True).map({True: " ⏳", False: ""}) # 제한 시간 내 미수신: 직전 값 유지
+    chg_str = chg.map("{:+.2f}".format) + symbols.map(formulas.change_unit)
+    peg_str = peg.map("{:.2f}".format).where(peg.notna(), "-")
+
+    df = pd.DataFrame({
+        "✅": pd.Series(names).isin(st.session_state.checked_items),
+        "항목": names,
+        "현재가": price_str,
         "등락률": chg_str,
         "PEG": peg_str
     })
+    colors = chg_str.str[0].map({"+": UP_STYLE, "-": DOWN_STYLE}).fillna(FLAT_STYLE)
+    return df, colors
 
-df = pd.DataFrame(df_list)
-import math
-num_left = math.ceil(len(df) / 2) if len(df) > 0 else 0
-df_left = df.iloc[:num_left].copy()
-df_right = df.iloc[num_left:].copy()
-
-def apply_row_color(row):
-    chg_val = row['등락률']
-    if not isinstance(chg_val, str): color = 'color: gray;'
-    elif chg_val.startswith('+'): color = 'color: #ff4d4d; font-weight: bold;'
-    elif chg_val.startswith('-'): color = 'color: #4d94ff; font-weight: bold;'
-    else: color = 'color: gray;'
-    return [''] * 2 + [color] * 3 
-
-if not df_left.empty: styled_left = df_left.style.apply(apply_row_color, axis=1)
-else: styled_left = df_left
-
-if not df_right.empty: styled_right = df_right.style.apply(apply_row_color, axis=1)
-else: styled_right = df_right
+def style_quotes(df, colors):
+    if df.empty: return df
+    css = pd.DataFrame("", index=df.index, columns=df.columns)
+    for col in ["현재가", "등락률", "PEG"]:
+        css[col] = colors.loc[df.index]
+    return df.style.apply(lambda _: css, axis=None)
 
 col_config = {
     "✅": st.column_config.CheckboxColumn("선택", width="small"),
@@ -292,15 +284,45 @@ col_config = {
     "PEG": st.column_config.TextColumn("PEG", width="small")
 }
 
-table_col1, table_col2 = st.columns(2)
-with table_col1:
-    edited_left = st.data_editor(styled_left, column_config=col_config, disabled=["항목", "현재가", "등락률", "PEG"], hide_index=True, use_container_width=True, key="edit_left")
-with table_col2:
-    edited_right = st.data_editor(styled_right, column_config=col_config, disabled=["항목", "현재가", "등락률", "PEG"], hide_index=True, use_container_width=True, key="edit_right")
+def format_age(seconds):
+    for unit, size in (("일", 86400), ("시간", 3600), ("분", 60)):
+        if seconds >= size: return f"{int(seconds // size)}{unit}"
+    return f"{int(seconds)}초"
+
+# 서버 재시작 직후에는 저장된 스냅샷을 먼저 보여 주고, 폴러가 새로 수집할 때까지 이 주기로 표만 다시 확인
+REVALIDATE_POLL = 2
+
+def render_quote_tables():
+    register_session() # 자동고침은 fragment 만 다시 실행하므로 여기서 세션 접속 시각을 갱신 (SESSION_TTL 만료 방지)
+    was_restored = st.session_state.get("snapshot_restored", False)
+    read_snapshot(news=False)
+    if was_restored and not st.session_state.snapshot_restored:
+        st.rerun() # 새 시세 도착: 전체를 다시 그려 자동고침 주기를 원래 설정으로 되돌림
+    age = max(0, datetime.now().timestamp() - st.session_state.snapshot_fetched_at)
+    if st.session_state.snapshot_restored:
+        st.caption(f"마지막 갱신: {st.session_state.last_update} (저장된 스냅샷, {format_age(age)} 전 · 최신 시세 받는 중...)")
+    elif datetime.now().timestamp() - poller.healthy_at > poller.interval * 3: # 폴링이 실패하고 있거나 멈춤
+        st.caption(f"마지막 갱신: {st.session_state.last_update} (⏳ {format_age(age)} 전 시세 · 갱신 실패 또는 지연, 진단 패널 참고)")
+    else:
+        st.caption(f"마지막 갱신: {st.session_state.last_update}")
+
+    with metrics.timer("render"): # 표 빌드 + 직렬화
+        df, colors = build_quote_frame()
+        num_left = math.ceil(len(df) / 2) if len(df) > 0 else 0
+        df_left = df.iloc[:num_left]
+        df_right = df.iloc[num_left:]
+
+        table_col1, table_col2 = st.columns(2)
+        with table_col1:
+            edited_left = st.data_editor(style_quotes(df_left, colors), column_config=col_config, disabled=["항목", "현재가", "등락률", "PEG"], hide_index=True, use_container_width=True, key="edit_left")
+        with table_col2:
+            edited_right = st.data_editor(style_quotes(df_right, colors), column_config=col_config, disabled=["항목", "현재가", "등락률", "PEG"], hide_index=True, use_container_width=True, key="edit_right")
+
+    new_checked_left = edited_left[edited_left["✅"] == True]["항목"].tolist() if not edited_left.empty else []
+    new_checked_right = edited_right[edited_right["✅"] == True]["항목"].tolist() if not edited_right.empty else []
+    st.session_state.checked_items = new_checked_left + new_checked_right
 
-new_checked_left = edited_left[edited_left["✅"] == True]["항목"].tolist() if not edited_left.empty else []
-new_checked_right = edited_right[edited_right["✅"] == True]["항목"].tolist() if not edited_right.empty else []
-st.session_state.checked_items = new_checked_left + new_checked_right
+st.fragment(run_every=REVALIDATE_POLL if poller.snapshot.restored else refresh_opts[refresh_sel] or None)(render_quote_tables)()
 
 # [요청 5] "관련 뉴스" 로 명칭 변경
 st.markdown("<hr style='border: 1px solid #3a3a52;'>", unsafe_allow_html=True)
@@ -309,7 +331,7 @@ with col_news_title:
     st.subheader("📰 관련 뉴스")
 with col_news_btn:
     if st.button("🔄 뉴스 새로고침", use_container_width=True):
-        fetch_news()
+        poller.news.request_refresh(wait=True, timeout=NEWS_TIMEOUT * 2)
         st.rerun()
 
 news_html = "<div style='background-color:#252538; padding:15px; border-radius:8px; border:1px solid #3a3a52; margin-bottom: 20px;'>"
@@ -338,40 +360,11 @@ if st.button("▶ 체크된 종목 타겟 AI 시뮬레이션 실행", use_contai
             vkospi_chg = vkospi.get("raw_change", 0.0)
             macro_sentiment = "리스크 회피(Risk-Off) 경계 구간" if vkospi_chg > 0 else "위험자산 선호(Risk-On) 모멘텀 회복"
             
-            macro_keywords = ["VIX", "VKOSPI", "코스피", "반도체", "NBI", "선물", "금리", "USD", "CPI", "금", "원유", "T10Y2Y"]
-            quant_results = []
-            
-            for name in st.session_state.checked_items:
-                if any(k in name for k in macro_keywords): continue 
-                
-                info = market.get(name, {})
-                price = info.get("raw_price", 0.0)
-                change = info.get("raw_change", 0.0)
-                peg = info.get("peg", None)
-                
-                if price <= 0: continue
-                
-                base_score = 50 + (change * 3)
-                
-                # [요청 2 확인] PEG 조건별 분석 멘트
-                if peg is not None:
-                    if peg < 0.95: 
-                        base_score += 20
-                        eval_text = "PEG < 1 : 성장성 대비 주가가 낮음 (저평가 가능성)"
-                    elif peg > 1.05: 
-                        base_score -= 15
-                        eval_text = "PEG > 1 : 성장성 대비 주가가 높음 (고평가 가능성)"
-                    else:
-                        base_score += 5
-                        eval_text = "PEG = 1 : 성장성 대비 주가가 적정함"
-                else:
-                    eval_text = "PEG 데이터 부족: 단기 수급 모멘텀만 추종"
-
-                final_score = min(max(int(base_score), 0), 100)
-                quant_results.append({
-                    "name": name, "price": price, "change": change, "peg": peg,
-                    "score": final_score, "eval": eval_text
-                })
+            # 스코어는 폴러가 갱신마다 관심종목 전체를 일괄 계산해 둔 순위표에서 가져옴 (거시 지표는 티커 메타데이터로 제외)
+            scores = poller.snapshot.scores
+            tickers = st.session_state.tickers
+            name_of = {tickers[n]: n for n in st.session_state.checked_items if n in tickers}
+            quant_results = scores[scores.index.isin(list(name_of)) & scores["score"].notna()]
 
             st.success(f"{model_sel} & {algo_sel} 데이터 연산 및 분석 완료!")
             
@@ -390,17 +383,39 @@ if st.button("▶ 체크된 종목 타겟 AI 시뮬레이션 실행", use_contai
             if len(quant_results) == 0:
                 st.markdown("* 선택하신 종목 중 분석 가능한 개별 주식 데이터가 없습니다. (거시 지표는 개별 분석에서 자동 제외됩니다.)")
             else:
-                for res in quant_results:
-                    n = res['name']
+                def pct(v): return "-" if pd.isna(v) else f"{v:+.2f}%"
+
+                for ticker, res in quant_results.iterrows():
+                    n = name_of[ticker]
                     p = f"{res['price']:,.0f}" if res['price'] > 1000 else f"{res['price']:,.2f}"
                     c = res['change']
-                    peg_str = f"{res['peg']:.2f}" if res['peg'] is not None else "데이터 없음"
+                    peg_str = f"{res['peg']:.2f}" if pd.notna(res['peg']) else "데이터 없음"
+                    vol_str = f"{res['vol_20d']:.1f}%" if pd.notna(res['vol_20d']) else "-"
+                    mom_str = f"{res['momentum_rank'] * 100:.0f}" if pd.notna(res['momentum_rank']) else "-"
                     color_dot = "🔴" if c > 0 else "🔵" if c < 0 else "⚪"
                     
                     st.markdown(f"""
                     * **{n}**: 현재가 **{p}원** ({color_dot} **{c:+.2f}%**)
-                      * **지표분석:** PEG = **{peg_str}** | 알고리즘 스코어 = **{res['score']}점 / 100점**
+                      * **지표분석:** PEG = **{peg_str}** | 알고리즘 스코어 = **{int(res['score'])}점 / 100점** | 관심종목 내 **{int(res['rank'])}위**
+                      * **추세/리스크:** 수익률 5일 {pct(res['ret_5d'])} · 20일 {pct(res['ret_20d'])} · 60일 {pct(res['ret_60d'])} | 변동성(20일, 연율) {vol_str} | 1년 고점 대비 {pct(res['drawdown'])} | 20일 모멘텀 백분위 {mom_str}
                       * **AI 해석:** {res['eval']}
                     """)
 
+# 수집 지연/캐시 적중/오류 진단 (느린 종목, 상장폐지·티커 오류(NoData), 시간 초과(Timeout) 구분)
+with st.expander("🩺 진단: 수집 지연 · 캐시 · 오류", expanded=False):
+    diag1, diag2 = st.columns(2)
+    diag1.caption("구간별 지연(초)")
+    diag1.dataframe(metrics.stage_table().round(3), use_container_width=True)
+    diag2.caption("캐시 적중")
+    diag2.dataframe(metrics.cache_table().round(3), use_container_width=True)
+    diag1.caption("오류 유형")
+    diag1.dataframe(metrics.error_table(), hide_index=True, use_container_width=True)
+    diag2.caption("느린 종목 (티커 단위 요청 지연: 펀더멘털·단일 종목·수식, 초 — 배치 시세 수집은 구간별 fetch)")
+    diag2.dataframe(metrics.ticker_table(20).round(3), use_container_width=True)
+    st.caption("수집 스케줄 (시장 · 장 상태 · 다음 수집까지 초 · 연속 무변동 횟수)")
+    st.dataframe(pd.DataFrame.from_dict(poller.scheduler.table(), orient="index"), use_container_width=True)
+    dl1, dl2, _ = st.columns([1, 1, 3])
+    dl1.download_button("Prometheus 텍스트", metrics.to_prometheus(), file_name="metrics.prom", mime="text/plain")
+    dl2.download_button("JSON", metrics.to_json(), file_name="metrics.json", mime="application/json")
+
 st.markdown("<br><hr style='border: 1px solid #3a3a52;'><p style='text-align: right; color: #a1a1bb; font-style: italic; font-weight: bold;'>모두가 부자 되길 바라는 주린(인) 김병권</p>", unsafe_allow_html=True)
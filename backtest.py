@@ -0,0 +1,141 @@
+# AI 스캐닝 스코어 규칙 백테스트 (오프라인)
+# - 로컬 일봉 저장소(bar_store)만 읽어서, 매 거래일 [50 + 당일 등락률 x 3 + PEG 가감] 점수로 상위 N 종목을 고르고
+#   다음 horizon 거래일 수익률로 적중률/평균 수익률/벤치마크 대비 초과수익/회전율/순위 IC 를 집계
+# - 종목별 시계열 계산은 종목 묶음 단위로 프로세스 풀에 나눠 돌리고, 날짜별 횡단면 순위는 본 프로세스에서 일괄 계산
+#
+# 사용 예)
+#   python backtest.py --years 5 --top 5                  # 기본 관심종목 목록의 개별 주식으로 5년 백테스트
+#   python backtest.py --list 반도체 --years 3            # 다른 관심종목 목록
+#   python backtest.py --tickers AAPL MSFT NVDA --horizon 5
+#   python backtest.py --seed --years 5                   # (온라인) 저장소에 5년치 일봉을 먼저 적재
+import argparse
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import bar_store
+import scoring
+import watchlist_store
+
+CHUNK = 50 # 워커 하나가 맡는 종목 수
+
+def load_universe(tickers=None, list_name=watchlist_store.DEFAULT_LIST):
+    """백테스트 대상 개별 주식 티커 (거시 지표/수식 제외)"""
+    if not tickers:
+        if list_name not in watchlist_store.lists():
+            raise SystemExit(f"관심종목 목록 '{list_name}' 이 없습니다. --list 또는 --tickers 로 대상을 지정하세요.")
+        tickers = list(watchlist_store.load(list_name).values())
+    return [t for t in dict.fromkeys(tickers) if scoring.classify(t) == "equity"]
+
+def seed(tickers, years):
+    """(온라인) 데이터 공급자에서 years 년치 일봉을 받아 저장소에 병합"""
+    import providers
+    for i in range(0, len(tickers), CHUNK):
+        group = tickers[i:i + CHUNK]
+        data = providers.get().download(group, period=f"{years}y")
+        n = bar_store.save_bars(data, group)
+        print(f"[seed] {i + len(group)}/{len(tickers)} 종목, {n}개 봉 저장")
+
+def symbol_panel(args):
+    """(워커) 종목 묶음의 일별 등락률과 horizon 거래일 뒤 수익률 — 종목마다 자기 거래일 기준"""
+    db, tickers, days, horizon = args
+    bar_store.BARS_DB = db
+    bars = bar_store.load_last_closes(tickers, None, days=days)
+    if bars.empty:
+        return bars
+    by = bars.groupby("ticker", sort=False)["close"]
+    return bars.assign(
+        change=by.pct_change() * 100,
+        fwd=by.shift(-horizon) / bars["close"] - 1,
+    )[["ticker", "date", "change", "fwd"]]
+
+def run(tickers, years=5, top=5, horizon=1, workers=None, peg=None):
+    """peg: {ticker: PEG} — 과거 시점 PEG 이력이 없어 주면 전 기간에 같은 값을 씀 (미래 정보 편향 주의)"""
+    days = int(years * 366) + horizon * 2 + 10
+    jobs = [(bar_store.BARS_DB, tickers[i:i + CHUNK], days, horizon) for i in range(0, len(tickers), CHUNK)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = [p for p in pool.map(symbol_panel, jobs) if not p.empty]
+    if not parts:
+        raise SystemExit("저장소에 백테스트할 일봉이 없습니다. 먼저 --seed 로 적재하세요.")
+
+    panel = pd.concat(parts, ignore_index=True)
+    change = panel.pivot(index="date", columns="ticker", values="change").sort_index()
+    fwd = panel.pivot(index="date", columns="ticker", values="fwd").reindex_like(change)
+    change = change.iloc[1:] # 첫 날은 등락률이 없음
+
+    # 날짜 x 종목 점수 행렬 (PEG 는 종목별 상수 가감)
+    peg = pd.Series(peg or {}, dtype=float).reindex(change.columns)
+    bucket = pd.Series(np.select([peg < 0.95, peg > 1.05, peg.notna()], ["저평가", "고평가", "적정"], "데이터 없음"), index=change.columns)
+    score = np.trunc(50 + change * 3 + bucket.map(scoring.PEG_ADJ)).clip(0, 100)
+    score = score.where(fwd.reindex_like(score).notna())
+    fwd = fwd.reindex_like(score)
+
+    picks = score.rank(axis=1, ascending=False, method="first") <= top
+    n_picks = picks.sum(axis=1)
+    days_mask = n_picks > 0
+    port = fwd.where(picks).mean(axis=1)[days_mask]
+    bench = fwd.where(score.notna()).mean(axis=1)[days_mask]
+    hit = (fwd > 0).where(picks).mean(axis=1)[days_mask]
+    held = picks & picks.shift(1, fill_value=False)
+    turnover = (1 - held.sum(axis=1) / n_picks.where(n_picks > 0))[days_mask].iloc[1:]
+    ic = score.rank(axis=1).corrwith(fwd.rank(axis=1), axis=1)[days_mask]
+
+    report = {
+        "종목 수": len(change.columns),
+        "기간": f"{change.index[0]} ~ {change.index[-1]}",
+        "거래일 수": int(days_mask.sum()),
+        "상위 N": top,
+        "보유 기간(거래일)": horizon,
+        "적중률(%)": hit.mean() * 100,
+        "상위 N 평균 수익률(%)": port.mean() * 100,
+        "전체 평균 수익률(%)": bench.mean() * 100,
+        "초과 수익률(%)": (port - bench).mean() * 100,
+        "평균 회전율(%)": turnover.mean() * 100,
+        "평균 순위 IC": ic.mean(),
+    }
+    if horizon == 1:
+        report["누적 수익률(%) 상위 N"] = (np.prod(1 + port) - 1) * 100
+        report["누적 수익률(%) 전체"] = (np.prod(1 + bench) - 1) * 100
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="AI 스캐닝 스코어 규칙 백테스트 (로컬 일봉 저장소 기준)")
+    parser.add_argument("--tickers", nargs="*", help="대상 티커 (생략 시 --list 관심종목 목록)")
+    parser.add_argument("--list", default=watchlist_store.DEFAULT_LIST, help="관심종목 목록 이름")
+    parser.add_argument("--years", type=float, default=5)
+    parser.add_argument("--top", type=int, default=5, help="매일 고르는 상위 종목 수")
+    parser.add_argument("--horizon", type=int, default=1, help="보유 기간(거래일)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--db", default=bar_store.BARS_DB, help="일봉 저장소 SQLite 경로")
+    parser.add_argument("--peg", choices=["none", "current"], default="none",
+                        help="current: 펀더멘털 캐시의 현재 PEG 를 전 기간에 적용 (미래 정보 편향)")
+    parser.add_argument("--seed", action="store_true", help="(온라인) 백테스트 전에 years 년치 일봉 적재")
+    parser.add_argument("--json", action="store_true", help="결과를 JSON 으로 출력")
+    args = parser.parse_args()
+
+    bar_store.BARS_DB = args.db
+    tickers = load_universe(args.tickers, args.list)
+    if args.seed:
+        seed(tickers, math.ceil(args.years))
+
+    peg = None
+    if args.peg == "current":
+        import fundamentals
+        from market_data import calc_peg
+        closes = bar_store.load_last_closes(tickers, 1)
+        last = dict(zip(closes["ticker"], closes["close"])) if not closes.empty else {}
+        peg = {t: calc_peg(f, last.get(t, 0.0)) for t, f in fundamentals.get_many(tickers).items()}
+
+    report = run(tickers, args.years, args.top, args.horizon, args.workers, peg)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=float))
+    else:
+        for k, v in report.items():
+            print(f"{k:>24}: {v:,.3f}" if isinstance(v, float) else f"{k:>24}: {v}")
+
+if __name__ == "__main__":
+    main()
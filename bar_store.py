@@ -0,0 +1,139 @@
+# 종목별 일봉(OHLCV) 로컬 저장소
+# - SQLite 한 파일에 (ticker, date) 키로 전체 히스토리를 보관하고, 갱신 시에는 새 봉만 덮어쓰기(병합)
+# - 앱 재시작 후에도 유지되며, 시세 계산/분석 로직은 모두 여기서 읽어 감
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+import pandas as pd
+
+BARS_DB = os.environ.get("BARS_DB", "market_bars.sqlite")
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+SQL_CHUNK = 500 # IN (...) 절 하나에 넣는 최대 티커 수
+
+_ready = set()
+
+def connect():
+    con = sqlite3.connect(BARS_DB, timeout=30)
+    if BARS_DB not in _ready:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS bars (
+                ticker TEXT NOT NULL, date TEXT NOT NULL,
+                open REAL, high REAL, low REAL, close REAL, volume REAL,
+                PRIMARY KEY (ticker, date)
+            ) WITHOUT ROWID
+        """)
+        _ready.add(BARS_DB)
+    return con
+
+@contextmanager
+def _db():
+    con = connect()
+    try:
+        with con: yield con # 정상 종료 시 commit, 예외 시 rollback
+    finally:
+        con.close()
+
+def _chunks(tickers):
+    tickers = list(dict.fromkeys(tickers))
+    for i in range(0, len(tickers), SQL_CHUNK):
+        yield tickers[i:i + SQL_CHUNK]
+
+def _query(sql, tickers, *params):
+    frames = []
+    with _db() as con:
+        for chunk in _chunks(tickers):
+            marks = ",".join("?" * len(chunk))
+            frames.append(pd.read_sql_query(sql.format(marks=marks), con, params=[*chunk, *params]))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def last_dates(tickers):
+    """티커별 마지막 저장 일자 {ticker: 'YYYY-MM-DD'} (저장 이력이 없으면 키 없음)"""
+    df = _query("SELECT ticker, MAX(date) AS date FROM bars WHERE ticker IN ({marks}) GROUP BY ticker", tickers)
+    return dict(zip(df["ticker"], df["date"])) if not df.empty else {}
+
+def first_dates(tickers):
+    """티커별 첫 저장 일자 {ticker: 'YYYY-MM-DD'} (저장 이력이 없으면 키 없음)"""
+    df = _query("SELECT ticker, MIN(date) AS date FROM bars WHERE ticker IN ({marks}) GROUP BY ticker", tickers)
+    return dict(zip(df["ticker"], df["date"])) if not df.empty else {}
+
+def closes_before(tickers, day, days=14):
+    """day 직전(days 일 안) 마지막 종가 {ticker: (date, close)} — 장중 값일 수 있는 마지막 봉 대신 확정된 봉을 비교 기준으로 씀"""
+    since = (date.fromisoformat(day) - timedelta(days=days)).isoformat()
+    # 집계 MAX 와 함께 고른 bare 열(close)은 SQLite 에서 최대 일자 행의 값
+    df = _query("""
+        SELECT ticker, MAX(date) AS date, close FROM bars
+        WHERE ticker IN ({marks}) AND date < ? AND date >= ? AND close IS NOT NULL GROUP BY ticker
+    """, tickers, day, since)
+    return {t: (d, c) for t, d, c in df.itertuples(index=False)} if not df.empty else {}
+
+def to_rows(data, tickers):
+    """yf.download 결과(열: 가격필드 x 티커)를 저장소 행 (ticker, date, Open, High, Low, Close, Volume) 으로 변환"""
+    if data is None or data.empty:
+        return pd.DataFrame(columns=["ticker", "date", *FIELDS])
+    data = data.copy()
+    if not isinstance(data.columns, pd.MultiIndex):
+        data.columns = pd.MultiIndex.from_product([data.columns, [tickers[0]]])
+    data.columns = data.columns.set_names(["field", "ticker"])
+
+    # 티커 열을 행으로 내림 (melt + pivot_table 은 MultiIndex 재구성 비용이 커서 stack 한 번으로 처리)
+    wide = data.rename_axis("date").stack("ticker", future_stack=True).reindex(columns=FIELDS)
+    wide = wide.dropna(subset=["Close"]).rename_axis(columns=None).reset_index()
+    wide["date"] = pd.to_datetime(wide["date"]).dt.strftime("%Y-%m-%d")
+    return wide[["ticker", "date", *FIELDS]]
+
+def save_bars(data, tickers, replace=False):
+    """yf.download 결과(열: 가격필드 x 티커)를 저장소에 병합. 같은 일자는 최신 값으로 교체.
+    replace=True 면 받아 온 티커의 기존 히스토리를 같은 트랜잭션에서 지우고 새로 씀 (수정주가 기준이 바뀐 경우)"""
+    wide = to_rows(data, tickers)
+    if wide.empty:
+        return 0
+    wide = wide.astype(object).where(wide.notna(), None)
+
+    with _db() as con:
+        if replace:
+            for chunk in _chunks(wide["ticker"]):
+                con.execute(f"DELETE FROM bars WHERE ticker IN ({','.join('?' * len(chunk))})", chunk)
+        con.executemany(
+            "INSERT OR REPLACE INTO bars (ticker, date, open, high, low, close, volume) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            wide[["ticker", "date", *FIELDS]].itertuples(index=False, name=None),
+        )
+    return len(wide)
+
+def _since(days):
+    return (date.today() - timedelta(days=days)).isoformat() if days else "0000-00-00"
+
+def load_last_closes(tickers, n=2, days=None):
+    """티커별 최근 n개 종가 (ticker, date, close), 티커 안에서는 날짜 오름차순.
+    days 를 주면 최근 days 일 안의 봉만 봄 (범위 검색이라 전체 히스토리를 정렬하지 않음), n=None 이면 개수 제한 없음"""
+    if n is None:
+        return _query("""
+            SELECT ticker, date, close FROM bars
+            WHERE ticker IN ({marks}) AND close IS NOT NULL AND date >= ? ORDER BY ticker, date
+        """, tickers, _since(days))
+    return _query("""
+        SELECT ticker, date, close FROM (
+            SELECT ticker, date, close, ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY date DESC) AS rn
+            FROM bars WHERE ticker IN ({marks}) AND close IS NOT NULL AND date >= ?
+        ) WHERE rn <= ? ORDER BY ticker, date
+    """, tickers, _since(days), n)
+
+def load_closes(tickers, days=None):
+    """종가 표 (행: 일자, 열: 티커). days 를 주면 최근 days 일치만 읽음"""
+    df = _query("SELECT ticker, date, close FROM bars WHERE ticker IN ({marks}) AND date >= ?", tickers, _since(days))
+    if df.empty:
+        return pd.DataFrame(columns=list(dict.fromkeys(tickers)), dtype=float)
+    closes = df.pivot(index="date", columns="ticker", values="close")
+    closes.index = pd.to_datetime(closes.index)
+    return closes.sort_index().reindex(columns=list(dict.fromkeys(tickers)))
+
+def load_bars(tickers, days=None):
+    """분석용 OHLCV 원본 (ticker, date, open, high, low, close, volume)"""
+    df = _query("SELECT * FROM bars WHERE ticker IN ({marks}) AND date >= ? ORDER BY ticker, date", tickers, _since(days))
+    if not df.empty:
+        df["date"] = pd.to_datetime(df["date"])
+    return df
@@ -0,0 +1,179 @@
+# 오프라인 성능 벤치마크 (관심종목 규모별 갱신 지연)
+# - 합성 녹화 데이터를 재생 공급자(providers.ReplayProvider)로 돌려 10 / 100 / 1,000 / 5,000 종목에서
+#   첫 수집(cold start), 전체 갱신 지연, 뉴스 수집, 화면(표) 렌더링, 최대 메모리, 외부 호출 수를 측정
+# - 규모마다 빈 저장소/캐시를 가진 별도 프로세스에서 실행 (모듈 캐시, 폴러 상태, 메모리 측정이 섞이지 않도록)
+#
+# 사용 예)
+#   python bench.py                                   # 기본 4개 규모
+#   python bench.py --sizes 10 100 --latency 0.05 --error-rate 0.02
+#   python bench.py --fixture ./recorded --json       # providers.record 로 녹화한 폴더 재생
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+SIZES = [10, 100, 1000, 5000]
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def watchlist(n):
+    """벤치마크용 관심종목 {이름: 티커} — 개별 주식 위주에 한국 종목, 지수, 수식 지표를 섞음"""
+    items = {}
+    for i in range(n):
+        if i % 50 == 1: items[f"합성지표{i}"] = f"B{i - 1} / B{i + 1}"
+        elif i % 20 == 2: items[f"지수{i}"] = f"^B{i}"
+        elif i % 10 == 3: items[f"한국종목{i}"] = f"B{i}.KS"
+        else: items[f"종목{i}"] = f"B{i}"
+    return items
+
+def make_fixture(path, n, days):
+    """n 종목 규모 관심종목이 쓰는 모든 티커의 합성 일봉/펀더멘털/기본 피드 녹화"""
+    import formulas
+    import news
+    import providers
+    tickers = []
+    for t in watchlist(n).values():
+        tickers += formulas.parse(t).leaves if formulas.is_formula(t) else [t]
+    tickers = list(dict.fromkeys(tickers))
+
+    rng = np.random.default_rng(0)
+    dates = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=days)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.02, (days, len(tickers))), axis=0))
+    bars = pd.DataFrame({
+        "ticker": np.repeat(tickers, days),
+        "date": np.tile(dates.strftime("%Y-%m-%d"), len(tickers)),
+        "Close": close.T.ravel().round(4),
+    })
+    bars["Open"] = bars["High"] = bars["Low"] = bars["Close"]
+    bars["Volume"] = 1_000_000.0
+
+    info = {}
+    for t in tickers:
+        if rng.random() < 0.8:
+            eps = float(rng.uniform(1, 10))
+            info[t] = {"trailingEps": eps, "forwardEps": eps * float(rng.uniform(0.9, 1.4)), "trailingPE": float(rng.uniform(5, 40))}
+    feeds = {url: [{"title": f"{src} 기사 {k}", "link": f"{url}#{k}", "date": ""} for k in range(20)]
+             for src, url in news.DEFAULT_FEEDS}
+    providers.save_fixture(path, bars[["ticker", "date", "Open", "High", "Low", "Close", "Volume"]], info, feeds)
+
+def run_child(n, refreshes, app):
+    """(측정 프로세스) 현재 작업 폴더의 빈 저장소에서 n 종목 측정 결과 dict"""
+    t0 = time.perf_counter()
+    import fundamentals
+    import market_data
+    import providers
+    import scoring
+    from news import NewsAggregator
+    result = {"종목 수": n, "import(s)": time.perf_counter() - t0}
+
+    tickers = list(watchlist(n).values())
+    provider = providers.get().load()
+
+    def calls():
+        return dict(provider.calls)
+
+    def phase(name, fn):
+        before = calls()
+        start = time.perf_counter()
+        out = fn()
+        result[f"{name}(s)"] = time.perf_counter() - start
+        result[f"{name} 호출"] = {k: v - before.get(k, 0) for k, v in calls().items() if v - before.get(k, 0)}
+        return out
+
+    def refresh(previous):
+        rows = market_data.collect_quotes(tickers, previous)
+        scoring.score_universe(rows)
+        return rows
+
+    def cold():
+        rows = refresh({})
+        while fundamentals.pending(): # 백그라운드 펀더멘털 수집이 끝날 때까지
+            time.sleep(0.01)
+        return rows
+
+    rows = phase("cold start", cold)
+    result["cold start 미수신"] = sum(1 for r in rows.values() if r.get("stale"))
+
+    laps = []
+    for _ in range(refreshes):
+        start = time.perf_counter()
+        rows = refresh(rows)
+        laps.append(time.perf_counter() - start)
+    result["갱신 중앙값(s)"], result["갱신 최대(s)"] = float(np.median(laps)), max(laps)
+    result["갱신 미수신"] = sum(1 for r in rows.values() if r.get("stale"))
+
+    agg = NewsAggregator()
+    agg.set_names(watchlist(n).keys())
+    phase("뉴스 첫 수집", agg.refresh)
+    phase("뉴스 재수집", agg.refresh) # 조건부 요청(304) 경로
+
+    if app:
+        from streamlit.testing.v1 import AppTest
+        with open("my_tickers.json", 'w', encoding='utf-8') as f:
+            json.dump(watchlist(n), f, ensure_ascii=False)
+        at = AppTest.from_file(os.path.join(HERE, "app.py"), default_timeout=600)
+        phase("화면 첫 렌더링", at.run)
+        phase("화면 재실행", at.run) # 세션 재실행 (표 빌드 포함)
+        result["화면 오류"] = len(at.exception)
+
+    result["최대 메모리(MB)"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return result
+
+def run_size(n, fixture, args):
+    workdir = tempfile.mkdtemp(prefix=f"bench{n}_")
+    env = dict(os.environ,
+               DATA_PROVIDER=f"replay:{os.path.abspath(fixture)}",  # 측정 프로세스는 임시 폴더에서 실행되므로 절대 경로로
+               REPLAY_LATENCY=str(args.latency), REPLAY_ERROR_RATE=str(args.error_rate),
+               BARS_DB=os.path.join(workdir, "bars.sqlite"),
+               FUNDAMENTALS_FILE=os.path.join(workdir, "fundamentals.json"),
+               NEWS_CACHE_FILE=os.path.join(workdir, "news.json"),
+               NEWS_FEEDS_FILE=os.path.join(workdir, "feeds.json"),
+               PYTHONPATH=HERE)
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", str(n), "--refreshes", str(args.refreshes)]
+    if args.no_app: cmd.append("--no-app")
+    out = subprocess.run(cmd, cwd=workdir, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        return {"종목 수": n, "오류": out.stderr.strip().splitlines()[-1:]}
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description="관심종목 규모별 갱신 성능 벤치마크 (네트워크 없이 재생 데이터 사용)")
+    parser.add_argument("--sizes", type=int, nargs="*", default=SIZES)
+    parser.add_argument("--days", type=int, default=260, help="합성 녹화 일봉 길이(거래일)")
+    parser.add_argument("--fixture", help="녹화 폴더 (생략 시 합성 데이터 생성)")
+    parser.add_argument("--latency", type=float, default=0.0, help="외부 호출당 주입 지연(초)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="외부 호출 실패 주입 확률")
+    parser.add_argument("--refreshes", type=int, default=3, help="전체 갱신 반복 횟수")
+    parser.add_argument("--no-app", action="store_true", help="화면(app.py) 렌더링 측정 생략")
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run_child(args.child, args.refreshes, not args.no_app), ensure_ascii=False))
+        return
+
+    results = []
+    for n in args.sizes:
+        fixture = args.fixture
+        if fixture is None: # 규모별로 따로 생성 (메모리 측정에 큰 녹화 데이터가 섞이지 않도록)
+            fixture = tempfile.mkdtemp(prefix=f"bench_fixture{n}_")
+            make_fixture(fixture, n, args.days)
+        results.append(run_size(n, fixture, args))
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+    for res in results:
+        print(f"--- {res['종목 수']:,} 종목")
+        for k, v in res.items():
+            if k == "종목 수": continue
+            print(f"{k:>20}: {v:,.3f}" if isinstance(v, float) else f"{k:>20}: {v}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+# 수식형 합성 지표
+# - 관심종목 티커 자리에 "^TNX - ^US2Y @bp", "SPY / TLT" 같은 수식을 그대로 넣을 수 있음
+# - 연산자(+ - * /)는 앞뒤를 띄어 써야 함 (DX-Y.NYB 처럼 티커 안의 '-' 와 구분)
+# - 끝에 "@bp" 를 붙이면 등락을 전일 대비 차이(bp, 값이 % 단위인 금리 기준), 생략하거나 "@%" 면 등락률(%)
+# - 수식의 구성 종목(leaf)은 일반 티커와 합쳐 중복 없이 한 번만 수집하고, 값은 공용 종가 표에서 일괄 계산
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+# 예전 하드코딩 지표 이름은 수식 별칭으로 유지 (저장된 my_tickers.json 호환)
+ALIASES = {
+    "CALC_T10Y2Y": "^TNX - ^US2Y @bp",
+    "CALC_RISKON": "SPY / TLT",
+}
+UNITS = ("%", "bp")
+OPERATORS = {"+", "-", "*", "/"}
+
+_TOKEN = re.compile(r"\(|\)|[+\-*/](?=\s|\(|$)|[^\s()]+")
+
+class Formula(NamedTuple):
+    text: str
+    tree: tuple    # ("num", 값) | ("sym", 티커) | (연산자, 왼쪽, 오른쪽)
+    leaves: tuple  # 수식에 쓰인 티커 (중복 제거, 등장 순서)
+    unit: str      # "%" 또는 "bp"
+
+def is_formula(ticker):
+    text = str(ticker).strip()
+    if text in ALIASES:
+        return True
+    return "(" in text or any(tok in OPERATORS for tok in text.split())
+
+@lru_cache(maxsize=1024)
+def parse(ticker):
+    text = ALIASES.get(str(ticker).strip(), str(ticker).strip())
+    expr, _, unit = text.partition("@")
+    unit = unit.strip() or "%"
+    if unit not in UNITS:
+        raise ValueError(f"알 수 없는 등락 단위: @{unit} (@% 또는 @bp)")
+
+    tokens = _TOKEN.findall(expr)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        pos += 1
+        return tokens[pos - 1]
+
+    def factor():
+        tok = peek()
+        if tok is None or tok in OPERATORS or tok == ")":
+            raise ValueError(f"수식 오류: '{expr.strip()}' 에서 값이 와야 할 자리에 '{tok or '끝'}'")
+        take()
+        if tok == "(":
+            node = expression()
+            if peek() != ")":
+                raise ValueError(f"수식 오류: '{expr.strip()}' 괄호가 닫히지 않음")
+            take()
+            return node
+        try:
+            return ("num", float(tok))
+        except ValueError:
+            return ("sym", tok.upper())
+
+    def term():
+        node = factor()
+        while peek() in ("*", "/"):
+            node = (take(), node, factor())
+        return node
+
+    def expression():
+        node = term()
+        while peek() in ("+", "-"):
+            node = (take(), node, term())
+        return node
+
+    tree = expression()
+    if peek() is not None:
+        raise ValueError(f"수식 오류: '{expr.strip()}' 의 '{peek()}' 를 해석할 수 없음")
+    return Formula(text, tree, tuple(dict.fromkeys(_leaves(tree))), unit)
+
+def _leaves(node):
+    if node[0] == "sym":
+        yield node[1]
+    elif node[0] != "num":
+        yield from _leaves(node[1])
+        yield from _leaves(node[2])
+
+def change_unit(ticker):
+    if not is_formula(ticker):
+        return "%"
+    try:
+        return parse(ticker).unit
+    except ValueError:
+        return "%"
+
+def _evaluate(node, closes):
+    kind = node[0]
+    if kind == "num":
+        return node[1]
+    if kind == "sym":
+        return closes[node[1]]
+    left, right = _evaluate(node[1], closes), _evaluate(node[2], closes)
+    if kind == "+": return left + right
+    if kind == "-": return left - right
+    if kind == "*": return left * right
+    return left / right
+
+def _raw_series(ticker, closes):
+    """일자별 수식 값. 0 으로 나눈 값(±inf)은 pandas 가 예외 없이 돌려주므로 NaN 으로 바꿔 둠"""
+    formula = parse(ticker)
+    frame = closes.reindex(columns=list(formula.leaves)).ffill().dropna()
+    values = pd.Series(_evaluate(formula.tree, frame), index=frame.index, dtype=float)
+    return values.replace([np.inf, -np.inf], np.nan)
+
+def series(ticker, closes):
+    """공용 종가 표(행: 일자, 열: 티커)에서 수식 값 시계열 계산. 휴장일 차이는 직전 값으로 채움, 계산 불가(0 나누기) 일자는 제외"""
+    return _raw_series(ticker, closes).dropna()
+
+def quote(ticker, closes):
+    """(현재값, 등락) — 등락은 수식 단위에 따라 % 또는 bp.
+    최신 일자 값이 계산 불가(분모 종가 0 등)이거나 계산할 종가가 2개 미만이면 None (화면에는 직전 값 + 미수신 표시)"""
+    raw = _raw_series(ticker, closes)
+    if raw.empty or pd.isna(raw.iloc[-1]):
+        return None
+    values = raw.dropna()
+    if len(values) < 2:
+        return None
+    val, prev = float(values.iloc[-1]), float(values.iloc[-2])
+    if parse(ticker).unit == "bp":
+        return val, (val - prev) * 100
+    return val, (val - prev) / prev * 100 if prev else 0.0
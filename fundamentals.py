@@ -0,0 +1,106 @@
+# PEG/EPS 계산용 펀더멘털 캐시
+# - stock.info 는 가장 느린 야후 API 라서 시세(1분)와 분리해 하루 단위로만 갱신
+# - 디스크(JSON)에 보관해 재시작 후에도 유지, 만료된 값은 일단 그대로 돌려주고 백그라운드에서 다시 받음
+#   (stale-while-revalidate)
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+import providers
+
+FUNDAMENTALS_FILE = os.environ.get("FUNDAMENTALS_FILE", "fundamentals_cache.json")
+FUNDAMENTALS_TTL = 24 * 60 * 60 # 초
+FUNDAMENTALS_RETRY = 60 * 60  # 받기에 실패한 티커는 이 시간(초) 동안 다시 요청하지 않음 (매 폴링마다 재시도하며 야후를 두드리지 않도록)
+FUNDAMENTAL_KEYS = ['pegRatio', 'trailingPegRatio', 'trailingEps', 'forwardEps', 'trailingPE', 'forwardPE']
+
+_lock = threading.Lock()
+_cache = None      # {ticker: {"fetched_at": epoch초, "data": {...}}}
+_inflight = set()  # 백그라운드 갱신이 진행 중인 티커
+_failed = {}       # 티커 -> 마지막 실패 시각(epoch초), 프로세스 안에서만 유지
+_dirty = False     # 디스크에 아직 기록하지 않은 갱신 결과가 있음
+_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="fundamentals")
+
+def _entries():
+    global _cache
+    if _cache is None:
+        try:
+            with open(FUNDAMENTALS_FILE, 'r', encoding='utf-8') as f:
+                _cache = json.load(f)
+        except (OSError, ValueError):
+            _cache = {}
+    return _cache
+
+def _save():
+    tmp = FUNDAMENTALS_FILE + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(_cache, f, ensure_ascii=False)
+    os.replace(tmp, FUNDAMENTALS_FILE)
+
+def fetch(ticker):
+    info = providers.get().info(ticker)
+    return {k: info.get(k) for k in FUNDAMENTAL_KEYS}
+
+def _revalidate(ticker):
+    global _dirty
+    try:
+        with metrics.timer("fundamentals", (ticker,)):
+            data = fetch(ticker)
+    except Exception as e:
+        metrics.error("fundamentals", e, (ticker,))
+        data = None # 실패 시 기존(만료된) 값을 그대로 유지하고 FUNDAMENTALS_RETRY 뒤에 재시도
+    with _lock:
+        if data is not None:
+            _entries()[ticker] = {"fetched_at": time.time(), "data": data}
+            _failed.pop(ticker, None)
+            _dirty = True
+        else:
+            _failed[ticker] = time.time()
+        _inflight.discard(ticker)
+        if _dirty and not _inflight:
+            _save() # 진행 중인 갱신이 모두 끝났을 때, 그 사이 하나라도 성공했으면 한 번만 기록
+            _dirty = False
+
+def pending():
+    """백그라운드 갱신이 진행 중인 티커 수"""
+    with _lock:
+        return len(_inflight)
+
+def get_many(tickers):
+    """캐시된 펀더멘털 {ticker: data}. 없거나 만료된 티커는 백그라운드 갱신만 걸어 두고 즉시 반환"""
+    now = time.time()
+    result = {}
+    with _lock:
+        entries = _entries()
+        for t in dict.fromkeys(tickers):
+            entry = entries.get(t)
+            expired = entry is None or now - entry["fetched_at"] > FUNDAMENTALS_TTL
+            metrics.cache("fundamentals", "miss" if entry is None else "stale" if expired else "hit")
+            if entry is not None:
+                result[t] = entry["data"]
+            if expired and t not in _inflight and now - _failed.get(t, 0) > FUNDAMENTALS_RETRY:
+                _inflight.add(t)
+                _pool.submit(_revalidate, t)
+    return result
+
+def get(ticker, wait=False):
+    """단일 티커 조회. wait=True 이면 캐시에 없을 때 직접 받아 옴 (종목 추가 시)"""
+    with _lock:
+        entry = _entries().get(ticker)
+    if entry is None and wait:
+        metrics.cache("fundamentals", "miss")
+        try:
+            with metrics.timer("fundamentals", (ticker,)):
+                data = fetch(ticker)
+        except Exception:
+            with _lock:
+                _failed[ticker] = time.time()
+            raise
+        with _lock:
+            _failed.pop(ticker, None)
+            _entries()[ticker] = {"fetched_at": time.time(), "data": data}
+            _save()
+        return data
+    return get_many([ticker]).get(ticker)
@@ -0,0 +1,377 @@
+# 시세 수집 엔진과 프로세스 공용 폴러 (뉴스는 news 모듈)
+# - 세션마다 따로 수집하지 않고, 서버 프로세스당 폴러 스레드 하나가 모든 세션 티커의 합집합을 주기적으로 갱신
+# - 결과는 바꿀 수 없는 스냅샷(MappingProxyType)으로 통째로 교체 발행하고, 각 세션은 읽기만 함
+# - 매 주기 전 종목을 받지 않고, scheduler 가 장 운영시간/값 변동을 보고 고른 종목만 받음 (나머지는 직전 값 유지)
+# - 발행한 스냅샷은 디스크(SNAPSHOT_FILE)에도 남겨, 서버가 다시 뜨면 수집을 기다리지 않고 바로 보여 준 뒤 백그라운드에서 갱신
+import gzip
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+from types import MappingProxyType
+from typing import NamedTuple
+
+import pandas as pd
+
+import bar_store
+import formulas
+import fundamentals
+import metrics
+import news
+import providers
+import scheduler
+import scoring
+
+# 동시 수집 설정: 워커 수 / 종목(배치)별 제한 시간(초) / 재시도 횟수 / 배치당 티커 수
+FETCH_WORKERS = int(os.environ.get("FETCH_WORKERS", 8))
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", 15))
+FETCH_RETRIES = int(os.environ.get("FETCH_RETRIES", 2))
+FETCH_BATCH_SIZE = int(os.environ.get("FETCH_BATCH_SIZE", 50))
+
+# 폴링 주기(초) / 이 시간 동안 다시 접속하지 않은 세션의 티커는 폴링 대상에서 제외
+POLL_INTERVAL = int(os.environ.get("POLL_INTERVAL", 60))
+SESSION_TTL = 15 * 60
+
+# 마지막 스냅샷 저장 파일 (gzip JSON). 비워 두면 저장/복원하지 않음
+SNAPSHOT_FILE = os.environ.get("SNAPSHOT_FILE", "market_snapshot.json.gz")
+
+def is_index_ticker(ticker):
+    return str(ticker).startswith('^') or '=' in str(ticker)
+
+# --- [요청 2] PEG 자체 계산식 완벽 코딩 ---
+# PEG 연산 로직 (인터넷 검색 -> 실패 시 PER / EPS 증가율 공식 계산)
+# 펀더멘털(EPS/PER/PEG 원자료)은 fundamentals 모듈의 일 단위 캐시에서, 주가는 실시간 값으로 계산
+def calc_peg(fund, current):
+    peg = fund.get('pegRatio') or fund.get('trailingPegRatio')
+
+    # 인터넷 API 검색 실패 시, 자체 수식으로 강제 계산
+    if peg is None:
+        t_eps = fund.get('trailingEps') # 전기 EPS
+        f_eps = fund.get('forwardEps')  # 당기 EPS
+        pe = fund.get('trailingPE') or fund.get('forwardPE') # PER
+
+        if pe is None and current > 0 and t_eps and t_eps > 0:
+            pe = current / t_eps # PER = 주가 / EPS
+
+        if t_eps and f_eps and pe and t_eps > 0:
+            eps_growth = ((f_eps - t_eps) / t_eps) * 100 # EPS 증가율(%)
+            if eps_growth > 0:
+                peg = pe / eps_growth # PEG = PER / EPS 증가율
+    return peg
+
+# 일봉은 로컬 저장소(bar_store)에 쌓아 두고, 갱신 시에는 마지막 저장일 이후 봉만 받아 병합
+BAR_SEED_PERIOD = "1y" # 저장 이력이 없는 신규 티커의 최초 적재 기간
+FORMULA_LOOKBACK_DAYS = 30 # 수식 지표 계산 시 읽어 오는 최근 일수
+QUOTE_LOOKBACK_DAYS = 35 # 현재가/등락률 계산 시 보는 최근 일수 (이보다 오래 거래가 없으면 시세 없음 처리)
+# 수정주가(auto_adjust) 기준: 분할/배당 뒤에는 야후가 과거 종가를 통째로 다시 계산하므로,
+# 다시 받은 확정 봉 종가가 저장값과 이 비율 넘게 다르면 그 티커 히스토리 전체를 다시 받음
+REBASE_TOLERANCE = float(os.environ.get("REBASE_TOLERANCE", 1e-4))
+
+def sync_bars(tickers):
+    last = bar_store.last_dates(tickers)
+    groups = {}
+    for t in dict.fromkeys(tickers):
+        groups.setdefault(last.get(t), []).append(t)
+    metrics.cache("bars", "hit", len(last)) # 저장 이력이 있어 새 봉만 받는 티커
+    metrics.cache("bars", "miss", sum(len(g) for start, g in groups.items() if start is None))
+    # 마지막 저장일이 같은 티커끼리 한 번에 요청 (마지막 봉은 장중 값일 수 있어 다시 받아 덮어씀)
+    # 기존 티커는 그 전 확정 봉부터 받아, 저장된 종가와 비교해 수정주가 기준이 바뀌었는지 확인
+    rebased = []
+    for start, group in groups.items():
+        if start is None:
+            data = providers.get().download(group, timeout=FETCH_TIMEOUT, period=BAR_SEED_PERIOD)
+            bar_store.save_bars(data, group)
+            continue
+        anchors = bar_store.closes_before(group, start)
+        since = min([start, *(d for d, _ in anchors.values())])
+        data = providers.get().download(group, timeout=FETCH_TIMEOUT, start=since)
+        rows = bar_store.to_rows(data, group).set_index(["ticker", "date"])["Close"]
+        changed = [t for t, (d, close) in anchors.items()
+                   if close and (t, d) in rows.index and abs(rows[(t, d)] / close - 1) > REBASE_TOLERANCE]
+        # 기준이 바뀐 티커는 새 봉도 저장하지 않음 (섞인 기준으로 남으면 다음 비교에서 못 잡음)
+        keep = [t for t in group if t not in changed]
+        if changed and keep:
+            data = data.loc[:, data.columns.get_level_values(-1).isin(keep)]
+        if keep:
+            bar_store.save_bars(data, keep)
+        rebased += changed
+    if rebased:
+        resync_bars(rebased)
+
+def resync_bars(tickers):
+    """수정주가 기준이 바뀐 티커의 저장 히스토리 전체를 다시 받아 교체 (저장 시작일이 같은 티커끼리 묶어서 요청)"""
+    metrics.error("bars", "Rebased", tickers) # 오류는 아니지만 어느 종목이 다시 적재됐는지 진단 표에서 보이도록
+    groups = {}
+    for t, first in bar_store.first_dates(tickers).items():
+        groups.setdefault(first, []).append(t)
+    for first, group in groups.items():
+        data = providers.get().download(group, timeout=FETCH_TIMEOUT, start=first)
+        bar_store.save_bars(data, group, replace=True)
+
+# 일반 티커를 묶어서 갱신하고, 종가/등락률은 전 종목 일괄(벡터) 연산
+def fetch_bulk_prices(tickers):
+    tickers = tuple(dict.fromkeys(tickers))
+    if not tickers:
+        return {}
+    # 배치 시간은 fetch 구간에만 기록 (티커별 지연에 배치 전체 시간을 넣으면 느린 종목이 아니라 느린 배치가 보임)
+    with metrics.timer("fetch", tickers if len(tickers) == 1 else ()):
+        sync_bars(tickers)
+
+        # 한국/미국 휴장일이 섞여 있어도 종목별 마지막 2개 종가로 계산
+        last = bar_store.load_last_closes(tickers, 2, days=QUOTE_LOOKBACK_DAYS)
+        if last.empty:
+            raise ValueError(f"{len(tickers)}개 티커 시세 응답 없음")
+        tail = last.groupby("ticker")["close"]
+        current, prev, count = tail.last(), tail.first(), tail.size()
+        change = ((current - prev) / prev * 100).where(count >= 2, 0.0)
+    metrics.success(current.index)
+    # 최근 봉이 하나도 없는 티커 (상장폐지/티커 오류 가능성) — 느린 종목, 시간 초과와 구분
+    missing = [t for t in tickers if t not in current.index]
+    if missing: metrics.error("fetch", "NoData", missing)
+    return {t: (float(current[t]), float(change[t])) for t in current.index}
+
+def fetch_single_stock(ticker):
+    try:
+        if formulas.is_formula(ticker):
+            legs = formulas.parse(ticker).leaves
+            with metrics.timer("formula", (ticker,)):
+                sync_bars(legs)
+                quote = formulas.quote(ticker, bar_store.load_closes(legs, days=FORMULA_LOOKBACK_DAYS))
+            if not quote:
+                metrics.error("formula", "NoData", (ticker,))
+                return 0.0, 0.0, None
+            metrics.success((ticker,))
+            return (*quote, None)
+
+        quote = fetch_bulk_prices((ticker,)).get(ticker)
+        if quote is None:
+            return 0.0, 0.0, None
+        current, change = quote
+
+        peg = None
+        if not is_index_ticker(ticker):
+            try: peg = calc_peg(fundamentals.get(ticker, wait=True) or {}, current)
+            except Exception as e: metrics.error("fundamentals", e, (ticker,))
+
+        return current, change, peg
+    except Exception as e:
+        metrics.error("fetch", e, (ticker,)) # 화면에는 0 으로 보이지만 원인은 진단 패널에 남김
+        return 0.0, 0.0, None
+
+def with_retry(fn, *args):
+    for attempt in range(FETCH_RETRIES + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == FETCH_RETRIES: raise
+            metrics.error("retry", e)
+            time.sleep(0.5 * 2 ** attempt) # 0.5s, 1s, 2s ... 지수 백오프
+
+# 한 종목이 멈춰도 전체가 막히지 않도록, 제한 시간 안에 끝난 작업 결과만 모아서 반환
+# jobs 의 키는 티커 묶음(tuple) — 시간 초과/실패는 묶음 안의 티커별 오류로 기록
+def run_fetch_pool(jobs):
+    pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS)
+    futures = {pool.submit(with_retry, fn, *args): key for key, (fn, *args) in jobs.items()}
+    done, _ = wait(futures, timeout=FETCH_TIMEOUT)
+    pool.shutdown(wait=False, cancel_futures=True)
+
+    results = {}
+    for f, key in futures.items():
+        if f not in done: metrics.error("fetch", "Timeout", key)
+        elif f.exception() is not None: metrics.error("fetch", f.exception(), key)
+        else: results[key] = f.result()
+    return results
+
+def collect_quotes(tickers, previous):
+    """티커별 시세 행 {ticker: {"raw_price", "raw_change", "peg"[, "stale"]}}. previous 는 직전 스냅샷"""
+    tickers = list(dict.fromkeys(tickers))
+    exprs = {t for t in tickers if formulas.is_formula(t)}
+    plain = [t for t in tickers if t not in exprs]
+    # 수식 구성 종목을 일반 티커와 합쳐 중복 없이 한 번만 수집
+    legs = []
+    for t in exprs:
+        try: legs.extend(formulas.parse(t).leaves)
+        except ValueError: pass
+    universe = list(dict.fromkeys(plain + legs))
+
+    jobs = {}
+    for i in range(0, len(universe), FETCH_BATCH_SIZE):
+        chunk = tuple(universe[i:i + FETCH_BATCH_SIZE])
+        jobs[chunk] = (fetch_bulk_prices, chunk)
+    quotes = {}
+    for res in run_fetch_pool(jobs).values():
+        quotes.update(res)
+    funds = fundamentals.get_many(t for t in plain if not is_index_ticker(t))
+
+    # 수식은 이번에 받아 온 구성 종목 종가 표 하나에서 일괄 계산
+    fresh = [leg for leg in dict.fromkeys(legs) if leg in quotes]
+    if exprs and fresh:
+        closes = bar_store.load_closes(fresh, days=FORMULA_LOOKBACK_DAYS)
+        for t in exprs:
+            try:
+                if set(formulas.parse(t).leaves) <= quotes.keys():
+                    q = formulas.quote(t, closes)
+                    if q:
+                        quotes[t] = q
+                        metrics.success((t,))
+                    else:
+                        metrics.error("formula", "NoData", (t,)) # 종가 부족 또는 분모 0 — 직전 값 유지(stale)
+            except (ValueError, KeyError, ZeroDivisionError) as e:
+                metrics.error("formula", e, (t,))
+
+    rows = {}
+    for ticker in tickers:
+        old = previous.get(ticker, {})
+        if ticker in quotes:
+            raw_price, raw_change = quotes[ticker]
+            if is_index_ticker(ticker) or ticker in exprs: peg = None
+            elif ticker in funds: peg = calc_peg(funds[ticker], raw_price)
+            else: peg = old.get("peg")
+            rows[ticker] = {"raw_price": raw_price, "raw_change": raw_change, "peg": peg}
+        else:
+            # 시간 초과/실패 종목은 0.0 대신 직전 값을 유지하고 stale 표시
+            rows[ticker] = {"raw_price": old.get("raw_price", 0.0), "raw_change": old.get("raw_change", 0.0), "peg": old.get("peg"), "stale": True}
+    return rows
+
+class Snapshot(NamedTuple):
+    quotes: MappingProxyType # ticker -> 시세 행 (읽기 전용)
+    scores: pd.DataFrame     # scoring.score_universe 순위표 (읽기 전용으로 취급)
+    updated_at: str
+    fetched_at: float = 0.0  # 수집 시각(epoch초)
+    restored: bool = False   # 디스크에서 복원한 뒤 아직 다시 수집하지 않은 스냅샷
+
+def save_snapshot(snapshot, path=SNAPSHOT_FILE):
+    if not path:
+        return
+    data = {
+        "updated_at": snapshot.updated_at,
+        "fetched_at": snapshot.fetched_at,
+        "quotes": {t: dict(row) for t, row in snapshot.quotes.items()},
+        "scores": snapshot.scores.to_dict("split"),
+    }
+    tmp = path + ".tmp"
+    with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def load_snapshot(path=SNAPSHOT_FILE):
+    """저장된 스냅샷 (restored=True), 없거나 읽을 수 없으면 None"""
+    if not path:
+        return None
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+        return Snapshot(
+            MappingProxyType({t: MappingProxyType(row) for t, row in data["quotes"].items()}),
+            pd.DataFrame(**data["scores"]),
+            data["updated_at"],
+            data["fetched_at"],
+            True,
+        )
+    except (OSError, ValueError, KeyError, TypeError, EOFError):
+        return None
+
+class MarketPoller:
+    """서버 프로세스당 하나만 두는 백그라운드 수집기 (app.py 에서 st.cache_resource 로 생성)"""
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self.snapshot = load_snapshot() or Snapshot(MappingProxyType({}), scoring.score_universe({}), "아직 업데이트되지 않음")
+        self.news = news.NewsAggregator() # 뉴스는 별도 스레드/주기로 수집 (시세 발행을 지연시키지 않음)
+        self.scheduler = scheduler.Scheduler(interval)
+        self._sessions = {} # session_id -> (티커 집합, 종목 이름 집합, 마지막 접속 시각)
+        self._cond = threading.Condition()
+        self._seq = 0       # 발행한 스냅샷 수
+        self._busy = False
+        self._wake = False
+        self.healthy_at = 0.0 # 마지막으로 폴링이 예외 없이 끝난 시각 (수집 예정 종목이 없던 주기 포함, 구독 세션이 없던 주기는 제외)
+        self._force = False # 다음 폴링은 스케줄과 관계없이 전 종목 수집 (수동 전체 갱신)
+        self._thread = threading.Thread(target=self._run, name="market-poller", daemon=True)
+
+    def start(self):
+        self.news.start()
+        self._thread.start()
+        return self
+
+    def register(self, session_id, tickers, names=()):
+        with self._cond:
+            self._sessions[session_id] = (frozenset(tickers), tuple(dict.fromkeys(names)), time.time())
+
+    def request_refresh(self, wait=False, timeout=None, force=False):
+        """다음 폴링을 즉시 시작. wait=True 이면 요청 이후에 시작된 폴링 결과가 발행될 때까지 대기.
+        force=True 이면 다음 폴링은 수집 예정이 아닌 종목까지 전부 받음"""
+        with self._cond:
+            target = self._seq + (2 if self._busy else 1)
+            self._wake = True
+            self._force = self._force or force
+            self._cond.notify_all()
+            if wait:
+                self._cond.wait_for(lambda: self._seq >= target, timeout)
+
+    def ensure(self, tickers, timeout=FETCH_TIMEOUT * 2):
+        """스냅샷에 없는 티커가 있으면 즉시 수집을 요청하고 결과를 기다림 (첫 접속/종목 추가).
+        모두 있지만 디스크에서 복원한 스냅샷이면 기다리지 않고 갱신만 요청 (stale-while-revalidate)"""
+        if set(tickers) - self.snapshot.quotes.keys():
+            self.request_refresh(wait=True, timeout=timeout)
+        elif self.snapshot.restored:
+            self.request_refresh()
+
+    def _universe(self):
+        now = time.time()
+        with self._cond:
+            self._sessions = {k: v for k, v in self._sessions.items() if now - v[2] < SESSION_TTL}
+            sessions = list(self._sessions.values())
+        self.news.set_names(n for v in sessions for n in v[1]) # 관심종목 순서 유지 (이름별 피드는 앞쪽 이름부터)
+        return set().union(*(v[0] for v in sessions))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._busy = True
+                self._wake = False
+                force, self._force = self._force, False
+            universe = self._universe()
+            self.scheduler.forget(universe)
+            previous = self.snapshot.quotes
+            due = self.scheduler.due(universe, force=force)
+            metrics.cache("schedule", "hit", len(universe) - len(due)) # 수집을 건너뛰고 직전 값을 쓴 종목
+            metrics.cache("schedule", "miss", len(due))
+            ok = True
+            if due:
+                try:
+                    with metrics.timer("poll"):
+                        fetched = collect_quotes(due, previous)
+                    self.scheduler.update(fetched)
+                    quotes = {t: dict(previous[t]) for t in universe if t in previous}
+                    quotes.update(fetched)
+                    try:
+                        with metrics.timer("score"):
+                            scores = scoring.score_universe(quotes)
+                    except Exception as e:
+                        metrics.error("score", e)
+                        scores = self.snapshot.scores # 스코어링 실패가 시세 발행을 막지 않도록
+                    self.snapshot = Snapshot(
+                        MappingProxyType({t: MappingProxyType(row) for t, row in quotes.items()}),
+                        scores,
+                        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        time.time(),
+                    )
+                    try: save_snapshot(self.snapshot)
+                    except OSError as e: metrics.error("snapshot", e)
+                except Exception as e:
+                    metrics.error("poll", e) # 수집 실패 시 직전 스냅샷 유지
+                    ok = False
+                    if self.snapshot.restored:
+                        # 복원 직후 첫 갱신이 실패해도 '받는 중' 상태로 멈춰 있지 않도록 해제 (화면은 시세 나이로 오래된 값임을 표시)
+                        self.snapshot = self.snapshot._replace(restored=False)
+            if ok and universe: self.healthy_at = time.time()
+            if universe:
+                try: metrics.dump()
+                except OSError as e: metrics.error("metrics", e)
+            with self._cond:
+                self._busy = False
+                self._seq += 1
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: self._wake, timeout=self.interval)
@@ -0,0 +1,193 @@
+# 수집/캐시/뉴스/렌더링 구간 계측 (프로세스 공용, 스레드 안전)
+# - 구간별/종목별 지연 히스토그램, 캐시 적중/미스, 구간별 오류 유형 수, 종목별 마지막 성공 시각과 마지막 오류
+# - 앱의 진단 패널, Prometheus 텍스트/JSON 덤프로 내보냄 (METRICS_FILE 을 주면 폴링 주기마다 파일로도 기록)
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import pandas as pd
+
+# 확장자가 .json 이면 JSON, 그 밖에는 Prometheus 텍스트 (node_exporter textfile collector 용)
+METRICS_FILE = os.environ.get("METRICS_FILE", "")
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, float("inf")) # 지연 구간 상한(초)
+PREFIX = "monitor"
+
+_lock = threading.Lock()
+_stages = {}                 # 구간 -> 히스토그램
+_tickers = {}                # 티커 -> 티커 단위 작업(펀더멘털 info, 단일 종목 수집, 수식) 지연 히스토그램. 배치 수집은 구간에만
+_cache = defaultdict(int)    # (캐시, hit|stale|miss) -> 횟수
+_errors = defaultdict(int)   # (구간, 오류 유형) -> 횟수
+_last_success = {}           # 티커 -> epoch초
+_last_error = {}             # 티커 -> (구간, 오류 유형, 메시지, epoch초)
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        for i, upper in enumerate(BUCKETS):
+            if seconds <= upper:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """버킷 상한 기준 근사 분위수"""
+        if not self.count:
+            return float("nan")
+        target, seen = q * self.count, 0
+        for upper, n in zip(BUCKETS, self.counts):
+            seen += n
+            if seen >= target:
+                return min(upper, self.max)
+        return self.max
+
+def _hist(table, key):
+    if key not in table:
+        table[key] = Histogram()
+    return table[key]
+
+def observe(stage, seconds, tickers=()):
+    with _lock:
+        _hist(_stages, stage).add(seconds)
+        for t in tickers:
+            _hist(_tickers, t).add(seconds)
+
+@contextmanager
+def timer(stage, tickers=()):
+    """with 블록 실행 시간을 구간(과 티커별) 지연으로 기록. 예외는 그대로 전파"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, tickers)
+
+def cache(name, result, n=1):
+    """캐시 조회 결과 기록 — result: hit / stale (만료 값 제공) / miss"""
+    if n:
+        with _lock:
+            _cache[(name, result)] += n
+
+def error(stage, exc, tickers=()):
+    """오류 기록. exc 는 예외 객체 또는 유형 이름 문자열 (Timeout, NoData 등)"""
+    kind = exc if isinstance(exc, str) else type(exc).__name__
+    message = "" if isinstance(exc, str) else str(exc)[:200]
+    now = time.time()
+    with _lock:
+        _errors[(stage, kind)] += 1
+        for t in tickers:
+            _last_error[t] = (stage, kind, message, now)
+
+def success(tickers):
+    now = time.time()
+    with _lock:
+        for t in tickers:
+            _last_success[t] = now
+
+def reset():
+    with _lock:
+        for table in (_stages, _tickers, _cache, _errors, _last_success, _last_error):
+            table.clear()
+
+def _summary(hist):
+    return {"count": hist.count, "mean": hist.total / hist.count if hist.count else float("nan"),
+            "p95": hist.quantile(0.95), "max": hist.max}
+
+def stage_table():
+    with _lock:
+        rows = {stage: _summary(h) for stage, h in _stages.items()}
+    return pd.DataFrame.from_dict(rows, orient="index", columns=["count", "mean", "p95", "max"])
+
+def cache_table():
+    with _lock:
+        counts = dict(_cache)
+    df = pd.Series(counts, dtype="int64").unstack(fill_value=0) if counts else pd.DataFrame()
+    df = df.reindex(columns=["hit", "stale", "miss"], fill_value=0)
+    df["hit_rate"] = (df["hit"] + df["stale"]) / df.sum(axis=1).where(lambda s: s > 0)
+    return df
+
+def error_table():
+    with _lock:
+        counts = dict(_errors)
+    s = pd.Series(counts, dtype="int64")
+    if s.empty:
+        return pd.DataFrame(columns=["stage", "type", "count"])
+    return s.rename_axis(["stage", "type"]).reset_index(name="count").sort_values("count", ascending=False)
+
+def ticker_table(n=None):
+    """티커별 수집 지연/마지막 성공/마지막 오류. 평균 지연 내림차순 (느린 종목 먼저)"""
+    with _lock:
+        rows = {t: _summary(h) for t, h in _tickers.items()}
+        names = set(rows) | set(_last_success) | set(_last_error)
+        success_at, errors = dict(_last_success), dict(_last_error)
+    df = pd.DataFrame.from_dict(rows, orient="index", columns=["count", "mean", "p95", "max"]).reindex(sorted(names))
+    fmt = lambda ts: time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+    df["last_success"] = [fmt(success_at[t]) if t in success_at else "" for t in df.index]
+    df["last_error"] = [f"{errors[t][0]}:{errors[t][1]}" if t in errors else "" for t in df.index]
+    df["last_error_at"] = [fmt(errors[t][3]) if t in errors else "" for t in df.index]
+    df = df.sort_values("mean", ascending=False, na_position="last")
+    return df.head(n) if n else df
+
+def to_dict():
+    with _lock:
+        return {
+            "stages": {s: _summary(h) for s, h in _stages.items()},
+            "tickers": {t: _summary(h) for t, h in _tickers.items()},
+            "cache": [{"cache": c, "result": r, "count": n} for (c, r), n in _cache.items()],
+            "errors": [{"stage": s, "type": k, "count": n} for (s, k), n in _errors.items()],
+            "last_success": dict(_last_success),
+            "last_error": {t: {"stage": s, "type": k, "message": m, "at": at} for t, (s, k, m, at) in _last_error.items()},
+        }
+
+def to_json():
+    return json.dumps(to_dict(), ensure_ascii=False)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels):
+    return ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+
+def _histogram_lines(name, table, label):
+    lines = [f"# TYPE {name} histogram"]
+    for key, h in table.items():
+        seen = 0
+        for upper, n in zip(BUCKETS, h.counts):
+            seen += n
+            le = "+Inf" if upper == float("inf") else repr(upper)
+            lines.append(f"{name}_bucket{{{_labels(**{label: key})},le=\"{le}\"}} {seen}")
+        lines.append(f"{name}_sum{{{_labels(**{label: key})}}} {h.total}")
+        lines.append(f"{name}_count{{{_labels(**{label: key})}}} {h.count}")
+    return lines
+
+def to_prometheus():
+    with _lock:
+        lines = _histogram_lines(f"{PREFIX}_stage_seconds", _stages, "stage")
+        lines += _histogram_lines(f"{PREFIX}_ticker_fetch_seconds", _tickers, "ticker")
+        lines.append(f"# TYPE {PREFIX}_cache_requests_total counter")
+        lines += [f"{PREFIX}_cache_requests_total{{{_labels(cache=c, result=r)}}} {n}" for (c, r), n in _cache.items()]
+        lines.append(f"# TYPE {PREFIX}_errors_total counter")
+        lines += [f"{PREFIX}_errors_total{{{_labels(stage=s, type=k)}}} {n}" for (s, k), n in _errors.items()]
+        lines.append(f"# TYPE {PREFIX}_last_success_timestamp_seconds gauge")
+        lines += [f"{PREFIX}_last_success_timestamp_seconds{{{_labels(ticker=t)}}} {ts}" for t, ts in _last_success.items()]
+    return "\n".join(lines) + "\n"
+
+def dump(path=METRICS_FILE):
+    """path 에 지표 기록 (비어 있으면 아무것도 안 함)"""
+    if not path:
+        return
+    text = to_json() if path.endswith(".json") else to_prometheus()
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
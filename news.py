@@ -0,0 +1,165 @@
+# 뉴스 수집기
+# - 피드를 동시에 받고, ETag/Last-Modified 조건부 요청으로 바뀐 피드만 다시 내려받음 (변경 없으면 304)
+# - 피드별 기사 목록과 조건부 요청 헤더는 디스크(JSON)에 누적 보관, 기사는 링크 기준으로 중복 제거
+# - 시세 폴러와 별도 스레드에서 돌기 때문에 뉴스가 느려도 시세 표 갱신은 기다리지 않음
+import json
+import os
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait
+from types import MappingProxyType
+
+import metrics
+import providers
+
+NEWS_CACHE_FILE = os.environ.get("NEWS_CACHE_FILE", "news_cache.json")
+# [{"source": "표시 이름", "url": "RSS 주소"}, ...] 형식 파일이 있으면 기본 피드 대신 사용
+NEWS_FEEDS_FILE = os.environ.get("NEWS_FEEDS_FILE", "news_feeds.json")
+NEWS_INTERVAL = int(os.environ.get("NEWS_INTERVAL", 300)) # 초
+NEWS_TIMEOUT = 10
+NEWS_WORKERS = 8
+NEWS_PER_FEED = 4       # 기본 피드당 화면에 보이는 기사 수
+NEWS_PER_NAME = 2       # 관심종목 이름별 검색 피드당 화면에 보이는 기사 수
+NEWS_KEEP = 30          # 피드당 디스크에 보관하는 기사 수
+# 관심종목 이름별 검색 피드는 이름 수만큼 요청이 늘어나서 기본은 끔. 켜면 앞쪽 NEWS_MAX_NAMES 개 이름까지만
+NEWS_PER_NAME_FEEDS = os.environ.get("NEWS_PER_NAME_FEEDS", "0") == "1"
+NEWS_MAX_NAMES = int(os.environ.get("NEWS_MAX_NAMES", 10))
+NEWS_MAX_ITEMS = 40     # 화면에 보내는 전체 기사 수 상한
+
+DEFAULT_FEEDS = [
+    ("한국/특징주", "https://news.google.com/rss/search?q=특징주+주식+경제+when:1d&hl=ko&gl=KR&ceid=KR:ko"),
+    ("Yahoo Macro", "https://finance.yahoo.com/rss/topstories")
+]
+
+def load_feeds():
+    try:
+        with open(NEWS_FEEDS_FILE, 'r', encoding='utf-8') as f:
+            return [(feed["source"], feed["url"]) for feed in json.load(f)]
+    except (OSError, ValueError, KeyError, TypeError):
+        return list(DEFAULT_FEEDS)
+
+def name_feed(name):
+    """관심종목 이름 하나당 구글 뉴스 검색 피드 (괄호 속 부가 설명은 검색어에서 제외)"""
+    query = name.split(" (")[0].strip()
+    url = "https://news.google.com/rss/search?" + urllib.parse.urlencode(
+        {"q": f"{query} when:1d", "hl": "ko", "gl": "KR", "ceid": "KR:ko"})
+    return (query, url)
+
+def fetch_feed(url, etag=None, modified=None):
+    """(기사 목록, etag, modified). 서버가 304 로 응답하면 기사 목록 대신 None"""
+    items, etag, modified = providers.get().feed(url, etag, modified, timeout=NEWS_TIMEOUT)
+    return (items[:NEWS_KEEP] if items is not None else None), etag, modified
+
+class NewsAggregator:
+    """서버 프로세스당 하나 (MarketPoller 가 소유). 최신 기사 목록은 items 로 읽기 전용 발행"""
+
+    def __init__(self, interval=NEWS_INTERVAL):
+        self.interval = interval
+        self._names = ()
+        self._cache = self._load() # url -> {"etag", "modified", "items"}
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._busy = False
+        self._wake = False
+        self._thread = threading.Thread(target=self._run, name="news-poller", daemon=True)
+        self.items = self._merge(self.feeds()) # 디스크에 남은 기사로 즉시 채워 둠
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def set_names(self, names):
+        names = tuple(dict.fromkeys(names))
+        added = set(names) - set(self._names)
+        self._names = names
+        if added & set(names[:NEWS_MAX_NAMES]) and NEWS_PER_NAME_FEEDS:
+            self.request_refresh() # 새 종목 이름 피드는 다음 주기를 기다리지 않고 바로 수집
+
+    def feeds(self):
+        """(출처, url, 표시 개수) 목록 — 기본 피드 + 관심종목 이름별 검색 피드"""
+        feeds = [(src, url, NEWS_PER_FEED) for src, url in load_feeds()]
+        if NEWS_PER_NAME_FEEDS:
+            feeds += [(*name_feed(n), NEWS_PER_NAME) for n in self._names[:NEWS_MAX_NAMES]]
+        return list({url: (src, url, n) for src, url, n in feeds}.values())
+
+    def request_refresh(self, wait=False, timeout=None):
+        with self._cond:
+            target = self._seq + (2 if self._busy else 1)
+            self._wake = True
+            self._cond.notify_all()
+            if wait:
+                self._cond.wait_for(lambda: self._seq >= target, timeout)
+
+    def _load(self):
+        try:
+            with open(NEWS_CACHE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp = NEWS_CACHE_FILE + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self._cache, f, ensure_ascii=False)
+        os.replace(tmp, NEWS_CACHE_FILE)
+
+    def _merge(self, feeds):
+        merged, seen = [], set()
+        for src, url, count in feeds:
+            shown = 0
+            for item in self._cache.get(url, {}).get("items", []):
+                if shown >= count or len(merged) >= NEWS_MAX_ITEMS: break
+                if item["link"] in seen: continue
+                seen.add(item["link"])
+                merged.append(MappingProxyType({"source": src, **item}))
+                shown += 1
+        return tuple(merged)
+
+    def refresh(self):
+        feeds = self.feeds()
+        pool = ThreadPoolExecutor(max_workers=NEWS_WORKERS)
+        futures = {}
+        with metrics.timer("news"):
+            for src, url, _ in feeds:
+                state = self._cache.get(url, {})
+                futures[pool.submit(fetch_feed, url, state.get("etag"), state.get("modified"))] = url
+            done, _ = wait(futures, timeout=NEWS_TIMEOUT * 2)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        changed = False
+        for f, url in futures.items():
+            if f not in done:
+                metrics.error("news", "Timeout")
+                continue
+            if f.exception() is not None:
+                metrics.error("news", f.exception())
+                continue
+            items, etag, modified = f.result()
+            metrics.cache("news", "hit" if items is None else "miss") # 304 = 조건부 요청 적중
+            state = self._cache.setdefault(url, {"items": []})
+            if (etag, modified) != (state.get("etag"), state.get("modified")):
+                state["etag"], state["modified"] = etag, modified
+                changed = True
+            if items is not None:
+                # 새 기사를 앞에 붙이고 기존 기사와 링크 기준 중복 제거
+                links = {i["link"] for i in items}
+                state["items"] = (items + [i for i in state["items"] if i["link"] not in links])[:NEWS_KEEP]
+                changed = True
+        if changed:
+            self._save()
+        self.items = self._merge(feeds)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._busy = True
+                self._wake = False
+            try:
+                self.refresh()
+            except Exception as e:
+                metrics.error("news", e) # 실패 시 직전 기사 목록 유지
+            with self._cond:
+                self._busy = False
+                self._seq += 1
+                self._cond.notify_all()
+                self._cond.wait_for(lambda: self._wake, timeout=self.interval)
@@ -0,0 +1,212 @@
+# 외부 데이터 공급자 (일봉 / 펀더멘털 / 뉴스 피드)
+# - market_data, fundamentals, news 는 yfinance/RSS 를 직접 부르지 않고 여기 공급자를 거침
+# - 기본은 실시간(LiveProvider), DATA_PROVIDER=replay:<폴더> 이면 녹화 파일 재생(ReplayProvider) — 네트워크 없이 실행/벤치마크
+# - 재생 공급자는 지연 시간/오류율을 주입할 수 있고, 모든 공급자가 종류별 외부 호출 수(calls)를 셈
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from datetime import date
+
+import pandas as pd
+
+import bar_store
+
+DATA_PROVIDER = os.environ.get("DATA_PROVIDER", "live") # "live" 또는 "replay:<녹화 폴더>"
+REPLAY_LATENCY = float(os.environ.get("REPLAY_LATENCY", 0))       # 호출당 평균 지연(초), 0.5~1.5배로 흔들림
+REPLAY_ERROR_RATE = float(os.environ.get("REPLAY_ERROR_RATE", 0)) # 호출이 ConnectionError 로 실패할 확률
+
+# 녹화 폴더 구성
+BARS_FILE = "bars.csv.gz"  # ticker, date, Open, High, Low, Close, Volume
+INFO_FILE = "info.json"    # {ticker: stock.info}
+FEEDS_FILE = "feeds.json"  # {url: [{"title", "link", "date"}, ...]}
+
+class Provider:
+    """공급자 인터페이스. 호출 수는 calls[종류] 에 누적 (download / info / feed)"""
+
+    def __init__(self):
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _count(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+
+    def download(self, tickers, timeout=None, **period):
+        """yf.download(group_by="column") 형식의 일봉 표. period 는 start= 또는 period= 하나"""
+        raise NotImplementedError
+
+    def info(self, ticker):
+        """stock.info 형식의 dict"""
+        raise NotImplementedError
+
+    def feed(self, url, etag=None, modified=None, timeout=None):
+        """(기사 목록, etag, modified). 바뀐 것이 없으면(304) 기사 목록 대신 None"""
+        raise NotImplementedError
+
+class LiveProvider(Provider):
+    """yfinance + RSS 실시간 조회 (yfinance/feedparser 는 가져오는 데 오래 걸려 첫 실제 호출 때 import)"""
+
+    def download(self, tickers, timeout=None, **period):
+        import yfinance as yf
+        self._count("download")
+        return yf.download(list(tickers), group_by="column", threads=True, progress=False, timeout=timeout, **period)
+
+    def info(self, ticker):
+        import yfinance as yf
+        self._count("info")
+        return yf.Ticker(ticker).info
+
+    def feed(self, url, etag=None, modified=None, timeout=None):
+        self._count("feed")
+        headers = {"User-Agent": "Mozilla/5.0 (data-monitoring news)"}
+        if etag: headers["If-None-Match"] = etag
+        if modified: headers["If-Modified-Since"] = modified
+        req = urllib.request.Request(urllib.parse.quote(url, safe=":/?&=+%"), headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=timeout) as resp:
+                body = resp.read()
+                etag, modified = resp.headers.get("ETag", etag), resp.headers.get("Last-Modified", modified)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None, etag, modified
+            raise
+
+        import feedparser
+        items = []
+        for entry in feedparser.parse(body).entries:
+            pub = entry.published[:16] if hasattr(entry, 'published') else ""
+            items.append({"title": entry.title, "link": entry.link, "date": pub})
+        return items, etag, modified
+
+def _period_start(period, last):
+    """yfinance 기간 문자열(5d, 3mo, 1y, max)의 시작일"""
+    m = re.fullmatch(r"(\d+)(d|wk|mo|y)", str(period))
+    if not m:
+        return pd.Timestamp.min
+    n, unit = int(m.group(1)), m.group(2)
+    offset = {"d": pd.DateOffset(days=n), "wk": pd.DateOffset(weeks=n), "mo": pd.DateOffset(months=n), "y": pd.DateOffset(years=n)}[unit]
+    return last - offset
+
+class ReplayProvider(Provider):
+    """녹화 폴더 재생. shift=True 이면 마지막 녹화일이 오늘이 되도록 날짜를 옮겨 최근 시세처럼 보이게 함"""
+
+    def __init__(self, path, latency=REPLAY_LATENCY, error_rate=REPLAY_ERROR_RATE, shift=True, seed=None):
+        super().__init__()
+        self.path = path
+        self.latency = latency
+        self.error_rate = error_rate
+        self.shift = shift
+        self._rng = random.Random(seed)
+        self._bars = None # ticker -> 일봉 표 (date 오름차순)
+        self._info = None
+        self._feeds = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """녹화 파일을 메모리에 올림 (첫 호출 때 자동, 벤치마크는 측정 전에 미리 호출)"""
+        with self._load_lock:
+            if self._bars is None:
+                self._read_all()
+        return self
+
+    def _read_all(self):
+        bars = pd.read_csv(os.path.join(self.path, BARS_FILE), parse_dates=["date"])
+        if self.shift and not bars.empty:
+            bars["date"] += pd.Timestamp(date.today()) - bars["date"].max()
+        self._bars = {t: g.drop(columns="ticker").set_index("date").sort_index() for t, g in bars.groupby("ticker", sort=False)}
+        self._info = self._read(INFO_FILE)
+        self._feeds = self._read(FEEDS_FILE)
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.path, name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except OSError:
+            return {}
+
+    def _call(self, kind):
+        self.load()
+        self._count(kind)
+        with self._lock:
+            delay = self.latency * self._rng.uniform(0.5, 1.5)
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise ConnectionError(f"재생 공급자 주입 오류 ({kind})")
+
+    def download(self, tickers, timeout=None, **period):
+        self._call("download")
+        frames = {t: self._bars[t] for t in dict.fromkeys(tickers) if t in self._bars}
+        if not frames:
+            return pd.DataFrame()
+        if "start" in period:
+            frames = {t: f.loc[pd.Timestamp(period["start"]):] for t, f in frames.items()}
+        elif "period" in period:
+            lo = _period_start(period["period"], max(f.index[-1] for f in frames.values()))
+            frames = {t: f.loc[lo:] for t, f in frames.items()}
+        data = pd.concat(frames, axis=1, names=["Ticker", "Price"]).swaplevel(axis=1).sort_index(axis=1)
+        return data.dropna(how="all")
+
+    def info(self, ticker):
+        self._call("info")
+        return dict(self._info.get(ticker, {}))
+
+    def feed(self, url, etag=None, modified=None, timeout=None):
+        self._call("feed")
+        items = self._feeds.get(url, [])
+        tag = '"' + hashlib.md5(json.dumps(items, sort_keys=True).encode()).hexdigest() + '"'
+        if tag == etag:
+            return None, etag, modified
+        return [dict(i) for i in items], tag, modified
+
+def save_fixture(path, bars, info=None, feeds=None):
+    """녹화 폴더 기록. bars 는 bar_store.to_rows 형식 (ticker, date, Open, High, Low, Close, Volume)"""
+    os.makedirs(path, exist_ok=True)
+    bars.to_csv(os.path.join(path, BARS_FILE), index=False)
+    with open(os.path.join(path, INFO_FILE), 'w', encoding='utf-8') as f:
+        json.dump(info or {}, f, ensure_ascii=False)
+    with open(os.path.join(path, FEEDS_FILE), 'w', encoding='utf-8') as f:
+        json.dump(feeds or {}, f, ensure_ascii=False)
+
+def record(path, tickers, feed_urls=(), period="1y", provider=None):
+    """(온라인) 실시간 공급자로 받은 일봉/펀더멘털/피드를 녹화 폴더에 저장"""
+    provider = provider or LiveProvider()
+    tickers = list(dict.fromkeys(tickers))
+    bars = pd.concat([bar_store.to_rows(provider.download(tickers[i:i + 50], period=period), tickers[i:i + 50])
+                      for i in range(0, len(tickers), 50)], ignore_index=True)
+    info = {}
+    for t in tickers:
+        try: info[t] = {k: v for k, v in provider.info(t).items() if isinstance(v, (int, float, str, type(None)))}
+        except Exception: pass
+    feeds = {}
+    for url in feed_urls:
+        try: feeds[url] = provider.feed(url)[0]
+        except Exception: pass
+    save_fixture(path, bars, info, feeds)
+
+def from_env(spec=DATA_PROVIDER):
+    kind, _, arg = spec.partition(":")
+    if kind == "replay":
+        return ReplayProvider(arg)
+    return LiveProvider()
+
+_active = from_env()
+
+def get():
+    """현재 공급자 (프로세스 공용)"""
+    return _active
+
+def use(provider):
+    """공급자 교체 (벤치마크/오프라인 실행용)"""
+    global _active
+    _active = provider
+    return provider
@@ -0,0 +1,313 @@
+# 장 운영시간 기반 티커별 수집 스케줄러
+# - 티커마다 거래 시장(KRX / 미국 주식 / CME 선물 / 외환)을 정하고, 지금 정규장/시간외/휴장 중 어디인지에 따라 다음 수집 시각을 둠
+# - 정규장은 폴링 주기마다, 시간외는 EXTENDED_FACTOR 배, 휴장 중에는 CLOSED_INTERVAL 마다 한 번만 확인
+# - 정규장에서 값이 BACKOFF_AFTER 번 넘게 연속으로 그대로인 종목은 주기를 2배씩(최대 2^MAX_BACKOFF 배) 늘리고, 바뀌면 바로 원래 주기로.
+#   시간외에는 늘리지 않음 (시간외 최대 지연은 폴링 주기 x EXTENDED_FACTOR 로 고정)
+# - 절충: 시간외 시세는 고정 주기(매 폴링)보다 최대 EXTENDED_FACTOR 배 늦게, 정규장에서 한동안 안 움직이던 종목은
+#   첫 변동이 최대 2^MAX_BACKOFF 주기 늦게 반영될 수 있음. 전 종목을 매 주기 받으려면 ADAPTIVE_POLL=0
+# - 개장/마감 시각에는 주기와 관계없이 다시 수집해 시가/종가를 놓치지 않음
+# - 폴러는 매 주기 due() 로 수집할 티커만 골라 받고, 나머지는 직전 스냅샷 값을 그대로 씀
+#
+# 휴장일: 미국은 NYSE 규칙으로 계산, KRX 는 아래 표(매년 갱신 필요). MARKET_HOLIDAYS_FILE 에 {"KRX": ["2027-01-01", ...]} 처럼
+# 추가 휴장일(임시 공휴일 등)을 적어 두면 합쳐서 씀. 조기 폐장은 반영하지 않음 (마감 후 CLOSED_INTERVAL 안에 다시 확인)
+#
+# 사용 예) python scheduler.py --hours 24 --list 기본     # 하루치 모의 실행: 고정 주기 대비 수집 횟수/최대 지연
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from datetime import date, datetime, time as dtime, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+import formulas
+
+POLL_INTERVAL = int(os.environ.get("POLL_INTERVAL", 60))
+ADAPTIVE_POLL = os.environ.get("ADAPTIVE_POLL", "1") == "1" # 0 이면 예전처럼 매 주기 전 종목 수집
+EXTENDED_FACTOR = 5          # 시간외(장전/장후) 수집 주기 = 폴링 주기 x 이 값
+CLOSED_INTERVAL = 60 * 60    # 휴장 중 확인 주기(초)
+MAX_BACKOFF = 3              # 값이 그대로인 종목의 주기 최대 2^3 = 8배
+BACKOFF_AFTER = 2            # 이 횟수까지의 무변동은 우연으로 보고 주기 유지 (거래가 활발한 종목의 정규장 지연 방지)
+BOUNDARY_DELAY = 60          # 개장/마감 후 이만큼 지나서 수집 (마감 직후 종가 반영 지연 대비)
+MARKET_HOLIDAYS_FILE = os.environ.get("MARKET_HOLIDAYS_FILE", "market_holidays.json")
+
+# 시장별 시간대와 (장전 시작, 정규장 시작, 정규장 끝, 장후 끝) — CME/FX 는 주 단위 연속 거래라 _phase 에서 따로 처리
+MARKETS = {
+    "KRX": ("Asia/Seoul", (dtime(8, 30), dtime(9, 0), dtime(15, 30), dtime(18, 0))),
+    "US": ("America/New_York", (dtime(4, 0), dtime(9, 30), dtime(16, 0), dtime(20, 0))),
+    "CME": ("America/Chicago", (dtime(16, 0), dtime(17, 0))), # 평일 16:00~17:00 일일 휴식, 일 17:00 개장 ~ 금 16:00
+    "FX": ("America/New_York", (dtime(17, 0),)),               # 일 17:00 ~ 금 17:00
+}
+
+KRX_HOLIDAYS = {
+    # 2025
+    "2025-01-01", "2025-01-27", "2025-01-28", "2025-01-29", "2025-01-30", "2025-03-03", "2025-05-01", "2025-05-05",
+    "2025-05-06", "2025-06-03", "2025-06-06", "2025-08-15", "2025-10-03", "2025-10-06", "2025-10-07", "2025-10-08",
+    "2025-10-09", "2025-12-25", "2025-12-31",
+    # 2026
+    "2026-01-01", "2026-02-16", "2026-02-17", "2026-02-18", "2026-03-02", "2026-05-01", "2026-05-05", "2026-05-25",
+    "2026-06-03", "2026-08-17", "2026-09-24", "2026-09-25", "2026-10-05", "2026-10-09", "2026-12-25", "2026-12-31",
+    # 2027
+    "2027-01-01", "2027-02-08", "2027-02-09", "2027-03-01", "2027-05-05", "2027-05-13", "2027-08-16", "2027-09-14",
+    "2027-09-15", "2027-09-16", "2027-10-04", "2027-10-11", "2027-12-27", "2027-12-31",
+}
+
+# --- 시장 / 휴장일 ---
+
+def market_of(ticker):
+    """티커의 거래 시장 이름 (알 수 없으면 None = 항상 정규장으로 취급)"""
+    t = str(ticker).strip().upper()
+    if t.endswith((".KS", ".KQ")) or t.startswith(("^KS", "^KQ")): return "KRX"
+    if t.endswith("=F"): return "CME"
+    if t.endswith("=X") or t == "DX-Y.NYB": return "FX"
+    if "." in t.lstrip("^"): return None # 그 밖의 해외 거래소 접미어 (.T, .HK, .L ...)
+    return "US"
+
+@lru_cache(maxsize=8192)
+def markets_of(ticker):
+    """수식은 구성 종목들의 시장, 일반 티커는 시장 하나 (튜플)"""
+    if formulas.is_formula(ticker):
+        try: return tuple(dict.fromkeys(market_of(leg) for leg in formulas.parse(ticker).leaves))
+        except ValueError: return (None,)
+    return (market_of(ticker),)
+
+def _observed(d):
+    """토요일 공휴일은 금요일, 일요일은 월요일에 쉼"""
+    if d.weekday() == 5: return d - timedelta(days=1)
+    if d.weekday() == 6: return d + timedelta(days=1)
+    return d
+
+def _nth_weekday(year, month, weekday, n):
+    """n 번째(n < 0 이면 끝에서) weekday 요일"""
+    if n > 0:
+        d = date(year, month, 1)
+        return d + timedelta(days=(weekday - d.weekday()) % 7 + 7 * (n - 1))
+    d = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return d - timedelta(days=(d.weekday() - weekday) % 7 + 7 * (-n - 1))
+
+def _easter(year):
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 19 * l) // 433
+    month = (h + l - 7 * m + 90) // 25
+    return date(year, month, (h + l - 7 * m + 33 * month + 19) % 32)
+
+def us_holidays(year):
+    """NYSE 정규 휴장일 (1월 1일이 토요일이면 전년 12/31 은 쉬지 않음)"""
+    new_year = date(year, 1, 1)
+    days = {
+        new_year if new_year.weekday() < 5 else _observed(new_year) if new_year.weekday() == 6 else None,
+        _nth_weekday(year, 1, 0, 3),           # 마틴 루터 킹 데이
+        _nth_weekday(year, 2, 0, 3),           # 대통령의 날
+        _easter(year) - timedelta(days=2),     # 성금요일
+        _nth_weekday(year, 5, 0, -1),          # 메모리얼 데이
+        _observed(date(year, 6, 19)),          # 준틴스
+        _observed(date(year, 7, 4)),           # 독립기념일
+        _nth_weekday(year, 9, 0, 1),           # 노동절
+        _nth_weekday(year, 11, 3, 4),          # 추수감사절
+        _observed(date(year, 12, 25)),         # 성탄절
+    }
+    return {d for d in days if d}
+
+def cme_holidays(year):
+    """CME 전일 휴장 (새해, 성금요일, 성탄절). 그 밖의 미국 공휴일은 조기 종료만 하므로 거래일로 취급"""
+    return {_observed(date(year, 1, 1)), _easter(year) - timedelta(days=2), _observed(date(year, 12, 25))}
+
+@lru_cache(maxsize=None)
+def _extra_holidays():
+    try:
+        with open(MARKET_HOLIDAYS_FILE, 'r', encoding='utf-8') as f:
+            return {m: frozenset(date.fromisoformat(d) for d in days) for m, days in json.load(f).items()}
+    except (OSError, ValueError, TypeError, AttributeError):
+        return {}
+
+@lru_cache(maxsize=64)
+def holidays(market, year):
+    if market == "KRX": days = {date.fromisoformat(d) for d in KRX_HOLIDAYS if d.startswith(str(year))}
+    elif market == "US": days = us_holidays(year)
+    elif market == "CME": days = cme_holidays(year)
+    else: days = set()
+    return frozenset(days | {d for d in _extra_holidays().get(market, ()) if d.year == year})
+
+def is_holiday(market, day):
+    return day in holidays(market, day.year)
+
+# --- 장 상태 ---
+
+def _phase(market, local):
+    day, t, wd = local.date(), local.time(), local.weekday()
+    if market == "CME":
+        # 일요일 저녁 세션은 다음 날(월요일) 거래일 — 거래일 기준으로 휴장일 판단
+        trade_day = day + timedelta(days=1) if t >= dtime(17, 0) else day
+        if is_holiday(market, trade_day) or trade_day.weekday() >= 5: return "closed"
+        return "closed" if dtime(16, 0) <= t < dtime(17, 0) else "open"
+    if market == "FX":
+        if wd == 5 or (wd == 6 and t < dtime(17, 0)) or (wd == 4 and t >= dtime(17, 0)): return "closed"
+        return "open"
+    if wd >= 5 or is_holiday(market, day): return "closed"
+    pre, open_, close, post = MARKETS[market][1]
+    if open_ <= t < close: return "open"
+    if pre <= t < post: return "extended"
+    return "closed"
+
+def phase(market, now=None):
+    """"open" / "extended" / "closed" (시장을 모르면 항상 open)"""
+    if market is None:
+        return "open"
+    now = now or datetime.now().astimezone()
+    return _phase(market, now.astimezone(ZoneInfo(MARKETS[market][0])))
+
+def next_change(market, now=None):
+    """장 상태가 바뀌는 다음 시각 (시장을 모르면 None)"""
+    if market is None:
+        return None
+    now = now or datetime.now().astimezone()
+    tz = ZoneInfo(MARKETS[market][0])
+    local = now.astimezone(tz)
+    current = _phase(market, local)
+    for offset in range(14): # 설/추석 연휴 + 주말도 넘도록
+        day = local.date() + timedelta(days=offset)
+        for t in MARKETS[market][1]:
+            at = datetime.combine(day, t, tzinfo=tz)
+            if at > local and _phase(market, at) != current:
+                return at
+    return None
+
+_RANK = {"open": 0, "extended": 1, "closed": 2}
+
+def status(now=None):
+    """{시장: (장 상태, 다음 변경 시각)} — 종목마다 다시 계산하지 않도록 한 번에"""
+    now = now or datetime.now().astimezone()
+    out = {m: (phase(m, now), next_change(m, now)) for m in MARKETS}
+    out[None] = ("open", None)
+    return out
+
+def ticker_phase(ticker, st):
+    """수식은 구성 종목 중 가장 활발한 시장 기준"""
+    return min((st[m][0] for m in markets_of(ticker)), key=_RANK.get)
+
+# --- 스케줄러 ---
+
+class Scheduler:
+    """티커별 다음 수집 시각. 폴러 스레드와 세션 스레드가 함께 부르므로 잠금으로 보호"""
+
+    def __init__(self, interval=POLL_INTERVAL, adaptive=ADAPTIVE_POLL):
+        self.interval = interval
+        self.adaptive = adaptive
+        self._lock = threading.Lock()
+        self._state = {} # ticker -> [다음 수집 epoch초, 연속 무변동 횟수, 직전 (가격, 등락)]
+
+    def due(self, tickers, now=None, force=False):
+        """지금 수집할 티커. 다음 폴링 전에 돌아오는 티커도 포함 (한 주기 늦어지지 않도록)"""
+        now = time.time() if now is None else now
+        if force or not self.adaptive:
+            return list(tickers)
+        horizon = now + self.interval / 2
+        with self._lock:
+            return [t for t in tickers if t not in self._state or self._state[t][0] <= horizon]
+
+    def interval_for(self, ticker, now, st, unchanged=0):
+        """다음 수집까지 초. st 는 status() 결과"""
+        state = ticker_phase(ticker, st)
+        if state == "closed":
+            wait = CLOSED_INTERVAL
+        elif state == "extended":
+            wait = self.interval * EXTENDED_FACTOR
+        else:
+            wait = self.interval * 2 ** min(max(unchanged - BACKOFF_AFTER, 0), MAX_BACKOFF)
+        changes = [st[m][1].timestamp() for m in markets_of(ticker) if st[m][1]]
+        if changes: # 개장/마감을 넘기지 않도록
+            wait = min(wait, min(changes) - now + BOUNDARY_DELAY)
+        return max(wait, self.interval / 2)
+
+    def update(self, rows, now=None):
+        """수집 결과 {ticker: 시세 행} 로 다음 수집 시각 갱신. 실패(stale) 종목은 다음 폴링에 다시"""
+        now = time.time() if now is None else now
+        st = status(datetime.fromtimestamp(now).astimezone())
+        with self._lock:
+            for t, row in rows.items():
+                _, unchanged, last = self._state.get(t, (0, 0, None))
+                if row.get("stale"):
+                    self._state[t] = [now, unchanged, last]
+                    continue
+                value = (row.get("raw_price"), row.get("raw_change"))
+                unchanged = unchanged + 1 if value == last else 0
+                self._state[t] = [now + self.interval_for(t, now, st, unchanged), unchanged, value]
+
+    def forget(self, keep):
+        """폴링 대상에서 빠진 티커 상태 정리"""
+        with self._lock:
+            self._state = {t: s for t, s in self._state.items() if t in keep}
+
+    def table(self, now=None):
+        """티커별 시장/장 상태/다음 수집까지 초/연속 무변동 횟수 — 진단용"""
+        now = time.time() if now is None else now
+        st = status(datetime.fromtimestamp(now).astimezone())
+        with self._lock:
+            state = dict(self._state)
+        return {t: {"market": "+".join(m or "-" for m in markets_of(t)), "phase": ticker_phase(t, st),
+                    "next_in": round(s[0] - now), "unchanged": s[1]}
+                for t, s in state.items()}
+
+# --- 모의 실행 (고정 주기 대비 수집 횟수 / 정규장 중 최대 지연) ---
+
+def simulate(tickers, start, hours, interval=POLL_INTERVAL, seed=0):
+    """start 부터 hours 시간 동안 interval 마다 폴링한다고 보고 수집 횟수와 값 변경이 반영되기까지의 지연을 셈.
+    값은 정규장에는 거의 매 주기, 시간외에는 드물게 바뀌고 휴장 중에는 그대로라고 가정"""
+    rng = random.Random(seed)
+    sched = Scheduler(interval, adaptive=True)
+    values = {t: 100.0 for t in tickers}
+    changed_at = {} # ticker -> (처음 바뀐 시각, 그때 장 상태)
+    fetched = fixed = 0
+    worst = {"open": 0.0, "extended": 0.0}
+    now = start.timestamp()
+    for _ in range(int(hours * 3600 / interval)):
+        st = status(datetime.fromtimestamp(now).astimezone())
+        for t in tickers:
+            state = ticker_phase(t, st)
+            if (state == "open" and rng.random() < 0.9) or (state == "extended" and rng.random() < 0.1):
+                values[t] += rng.uniform(-1, 1)
+                changed_at.setdefault(t, (now, state))
+        due = sched.due(tickers, now)
+        fixed += len(tickers)
+        fetched += len(due)
+        for t in due:
+            at, state = changed_at.pop(t, (now, "open"))
+            worst[state] = max(worst[state], now - at)
+        sched.update({t: {"raw_price": values[t], "raw_change": 0.0} for t in due}, now)
+        now += interval
+    return {"고정 주기 수집": fixed, "스케줄러 수집": fetched, "절감률(%)": 100 * (1 - fetched / fixed) if fixed else 0.0,
+            "정규장 반영 최대 지연(초)": worst["open"], "시간외 반영 최대 지연(초)": worst["extended"]}
+
+def main():
+    parser = argparse.ArgumentParser(description="장 운영시간 기반 수집 스케줄러 모의 실행")
+    parser.add_argument("--tickers", nargs="*", help="대상 티커 (생략 시 관심종목 목록)")
+    parser.add_argument("--list", help="관심종목 목록 이름 (기본 목록)")
+    parser.add_argument("--start", help="시작 시각 YYYY-MM-DD HH:MM (현지 시간, 생략 시 지금)")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--interval", type=int, default=POLL_INTERVAL)
+    parser.add_argument("--status", action="store_true", help="지금 시장별 장 상태와 다음 변경 시각만 출력")
+    args = parser.parse_args()
+
+    if args.status:
+        for m in MARKETS:
+            print(f"{m:>4}: {phase(m):<8} -> {next_change(m):%Y-%m-%d %H:%M %Z}")
+        return
+    tickers = args.tickers
+    if not tickers:
+        import watchlist_store
+        tickers = list(watchlist_store.load(args.list or watchlist_store.DEFAULT_LIST).values())
+    if not tickers:
+        raise SystemExit("대상 티커가 없습니다. --tickers 또는 --list 로 지정하세요.")
+    start = datetime.strptime(args.start, "%Y-%m-%d %H:%M").astimezone() if args.start else datetime.now().astimezone()
+    for k, v in simulate(tickers, start, args.hours, args.interval).items():
+        print(f"{k:>16}: {v:,.1f}" if isinstance(v, float) else f"{k:>16}: {v:,}")
+
+if __name__ == "__main__":
+    main()
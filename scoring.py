@@ -0,0 +1,91 @@
+# 관심종목 전체 퀀트 스코어링
+# - 종목별 일봉 히스토리(bar_store)로 기간별 수익률/실현 변동성/고점 대비 낙폭/모멘텀 순위/PEG 구간을 한 번에 계산
+# - 티커 루프 없이 (티커 x 거래일) 종가 행렬 하나로 한꺼번에 계산해 수천 종목도 갱신마다 재계산 가능
+# - 거시 지표 여부는 종목 이름이 아니라 티커 메타데이터(classify)로 판별
+import numpy as np
+import pandas as pd
+
+import bar_store
+import formulas
+
+HORIZONS = {"ret_5d": 5, "ret_20d": 20, "ret_60d": 60} # 기간별 수익률(거래일 기준)
+VOL_WINDOW = 20      # 실현 변동성 계산 구간(거래일)
+DRAWDOWN_WINDOW = 252 # 고점 대비 낙폭 기준 구간(거래일, 약 1년)
+HISTORY_DAYS = 380   # 위 구간을 덮기 위해 저장소에서 읽는 달력 일수
+
+# 티커 규칙(^지수, =F 선물, =X 환율, 수식)으로 판별되지 않는 거시 지표용 ETF/지수
+MACRO_TICKERS = {"DX-Y.NYB", "TIP", "TLT", "IEF", "SHY", "GLD", "USO", "UUP"}
+
+PEG_BUCKETS = {
+    "저평가": "PEG < 1 : 성장성 대비 주가가 낮음 (저평가 가능성)",
+    "고평가": "PEG > 1 : 성장성 대비 주가가 높음 (고평가 가능성)",
+    "적정": "PEG = 1 : 성장성 대비 주가가 적정함",
+    "데이터 없음": "PEG 데이터 부족: 단기 수급 모멘텀만 추종",
+}
+PEG_ADJ = {"저평가": 20, "고평가": -15, "적정": 5, "데이터 없음": 0} # PEG 구간별 스코어 가감
+
+def classify(ticker):
+    """자산 구분: formula / index / future / fx / macro_etf / equity"""
+    t = str(ticker).upper()
+    if formulas.is_formula(ticker): return "formula"
+    if t.startswith("^"): return "index"
+    if t.endswith("=F"): return "future"
+    if t.endswith("=X"): return "fx"
+    if t in MACRO_TICKERS: return "macro_etf"
+    return "equity"
+
+def history_matrix(tickers, width):
+    """티커별 최근 width 개 종가를 오른쪽 정렬한 (티커 수 x width) 행렬. 각 종목은 자기 거래일 기준, 빈 칸은 NaN"""
+    bars = bar_store.load_last_closes(tickers, None, days=HISTORY_DAYS)
+    mat = np.full((len(tickers), width), np.nan)
+    if bars.empty:
+        return mat
+    codes = pd.Categorical(bars["ticker"], categories=tickers).codes
+    from_end = bars.groupby("ticker", sort=False).cumcount(ascending=False).to_numpy()
+    keep = (from_end < width) & (codes >= 0)
+    mat[codes[keep], width - 1 - from_end[keep]] = bars["close"].to_numpy()[keep]
+    return mat
+
+def history_features(tickers):
+    """티커별 히스토리 지표 (index: ticker, 단위 %)"""
+    tickers = list(dict.fromkeys(tickers))
+    mat = history_matrix(tickers, DRAWDOWN_WINDOW + 1)
+    last = mat[:, -1]
+
+    out = pd.DataFrame(index=pd.Index(tickers, dtype=object))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for col, h in HORIZONS.items():
+            out[col] = (last / mat[:, -1 - h] - 1) * 100
+        rets = np.diff(mat[:, -(VOL_WINDOW + 1):], axis=1) / mat[:, -(VOL_WINDOW + 1):-1]
+        valid = np.isfinite(rets).sum(axis=1) >= 2
+        out["vol_20d"] = np.where(valid, np.nanstd(np.where(valid[:, None], rets, 0.0), axis=1, ddof=1), np.nan) * np.sqrt(252) * 100
+        out["drawdown"] = (last / np.fmax.reduce(mat, axis=1) - 1) * 100
+    return out
+
+def score_universe(quotes):
+    """시세 행 {ticker: {"raw_price", "raw_change", "peg"}} 전체를 스코어링한 순위표.
+    개별 주식은 score 내림차순, 거시 지표(macro=True)는 score 없이 맨 뒤"""
+    snap = pd.DataFrame.from_dict({t: dict(row) for t, row in quotes.items()}, orient="index")
+    snap = snap.reindex(columns=["raw_price", "raw_change", "peg"]).rename(columns={"raw_price": "price", "raw_change": "change"})
+    snap = snap.apply(pd.to_numeric)
+    snap["asset_class"] = snap.index.map(classify)
+    snap["macro"] = snap["asset_class"] != "equity"
+
+    equities = snap.index[~snap["macro"]]
+    df = snap.join(history_features(equities))
+
+    peg = df["peg"]
+    df["peg_bucket"] = np.select([peg < 0.95, peg > 1.05, peg.notna()], ["저평가", "고평가", "적정"], "데이터 없음")
+    df.loc[df["macro"], "peg_bucket"] = "데이터 없음"
+    df["eval"] = df["peg_bucket"].map(PEG_BUCKETS)
+
+    # [요청 2 확인] 기본 스코어: 50 + 당일 등락률 x 3, PEG 구간별 가감
+    adj = df["peg_bucket"].map(PEG_ADJ)
+    score = np.trunc(50 + df["change"].fillna(0) * 3 + adj).clip(0, 100)
+    scorable = ~df["macro"] & (df["price"] > 0)
+    df["score"] = score.where(scorable)
+    df["momentum_rank"] = df["ret_20d"].where(scorable).rank(pct=True)
+
+    df = df.sort_values(["macro", "score", "momentum_rank"], ascending=[True, False, False], na_position="last")
+    df["rank"] = np.where(df["score"].notna(), np.arange(1, len(df) + 1), np.nan)
+    return df
@@ -0,0 +1,219 @@
+# 종목 검색 색인 (KRX 유가증권/코스닥 + 미국 상장 종목)
+# - 로컬 압축 파일(SYMBOLS_FILE, 탭 구분 gzip) 하나를 처음 검색할 때 읽어서 서버 프로세스 공용으로 보관
+# - 접두어 검색: 정규화한 키(티커/한글명/영문명/한글 초성)의 정렬 목록에서 이진 탐색
+# - 오타/부분 일치 검색: 키별 글자 2-gram 역색인 + numpy bincount 로 전체 키의 Dice 점수를 한 번에 계산
+# - 색인 파일 만들기: python symbol_index.py --krx 전종목기본정보.csv --nasdaq nasdaqlisted.txt --other otherlisted.txt
+#   (--download-us 를 주면 미국 목록은 nasdaqtrader.com 에서 직접 받음)
+import argparse
+import bisect
+import csv
+import gzip
+import io
+import math
+import os
+import re
+import threading
+import urllib.request
+from typing import NamedTuple
+
+import numpy as np
+
+SYMBOLS_FILE = os.environ.get("SYMBOLS_FILE", "symbols.tsv.gz")
+SEARCH_LIMIT = 30 # 화면(선택 상자)에 보내는 최대 결과 수
+MIN_FUZZY = 0.5   # 오타/부분 일치 결과로 인정하는 최소 Dice 점수 (검색어와 키의 2-gram 겹침)
+
+US_LISTS = {
+    "nasdaq": "https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt",
+    "other": "https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt",
+}
+KRX_SUFFIX = {"KOSPI": ".KS", "유가증권": ".KS", "KOSDAQ": ".KQ", "코스닥": ".KQ"}
+
+class Symbol(NamedTuple):
+    ticker: str
+    name: str     # 화면 표시 이름 (한글명, 없으면 영문명)
+    name_en: str
+    market: str
+
+    @property
+    def label(self):
+        return f"{self.name} · {self.ticker}" + (f" ({self.market})" if self.market else "")
+
+_NOT_WORD = re.compile(r"[^0-9a-z가-힣ㄱ-ㅎ]+")
+_HANGUL = re.compile("[가-힣]")
+_CHOSEONG = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+
+def normalize(text):
+    """소문자, 공백/기호 제거 (SK 하이닉스 == sk하이닉스)"""
+    return _NOT_WORD.sub("", str(text).lower())
+
+def choseong(text):
+    """한글 초성 (삼성전자 -> ㅅㅅㅈㅈ), 한글이 아니면 그대로"""
+    return "".join(_CHOSEONG[(ord(c) - 0xAC00) // 588] if "가" <= c <= "힣" else c for c in text)
+
+def _bigrams(key):
+    return {key[i:i + 2] for i in range(len(key) - 1)} or {key}
+
+class SymbolIndex:
+    def __init__(self, symbols):
+        self.symbols = list({s.ticker.upper(): s for s in symbols}.values()) # 같은 티커는 뒤의 것(우선 항목)으로
+        self.by_ticker = {s.ticker.upper(): i for i, s in enumerate(self.symbols)}
+
+        # 검색 키: 티커, 거래소 접미어 뺀 코드, 이름 전체/단어별, 한글 이름 초성
+        pairs = set()
+        for i, s in enumerate(self.symbols):
+            texts = (s.ticker, s.ticker.split(".")[0], s.name, s.name_en, *s.name.split(), *s.name_en.split())
+            for w in {normalize(t) for t in texts}:
+                if w:
+                    pairs.add((w, i))
+                    if _HANGUL.search(w): pairs.add((choseong(w), i))
+        pairs = sorted(pairs)
+        self._keys = [k for k, _ in pairs]
+        self._key_ids = np.array([i for _, i in pairs], dtype=np.int32)
+
+        grams = {}
+        sizes = np.zeros(len(pairs), dtype=np.int32)
+        for k, key in enumerate(self._keys):
+            own = _bigrams(key)
+            sizes[k] = len(own)
+            for g in own:
+                grams.setdefault(g, []).append(k)
+        self._grams = {g: np.array(ks, dtype=np.int32) for g, ks in grams.items()}
+        self._sizes = sizes
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def lookup(self, ticker):
+        i = self.by_ticker.get(str(ticker).strip().upper())
+        return None if i is None else self.symbols[i]
+
+    def prefix(self, query, limit=SEARCH_LIMIT):
+        q = normalize(query)
+        if not q:
+            return []
+        lo = bisect.bisect_left(self._keys, q)
+        hi = bisect.bisect_left(self._keys, q + "\U0010ffff")
+        found = {}
+        for k in sorted(range(lo, min(hi, lo + limit * 20)), key=lambda k: len(self._keys[k])): # 짧은 키(더 정확한 일치) 우선
+            found.setdefault(int(self._key_ids[k]), None)
+        return [self.symbols[i] for i in list(found)[:limit]]
+
+    def fuzzy(self, query, limit=SEARCH_LIMIT):
+        q = normalize(query)
+        if not q:
+            return []
+        qgrams = _bigrams(q)
+        grams = [self._grams[g] for g in qgrams if g in self._grams]
+        if not grams:
+            return []
+        common = np.bincount(np.concatenate(grams), minlength=len(self._keys))
+        # Dice >= MIN_FUZZY 가 되려면 겹치는 2-gram 이 최소 이만큼은 있어야 함 (키 2-gram 수 >= 겹침 수)
+        need = max(1, math.ceil(MIN_FUZZY * len(qgrams) / (2 - MIN_FUZZY)))
+        keys = np.flatnonzero(common >= need)
+        score = 2 * common[keys] / (len(qgrams) + self._sizes[keys]) # 키 단위 Dice 계수
+        keep = score >= MIN_FUZZY
+        keys, score = keys[keep], score[keep]
+        found = {}
+        # 검색어 2-gram 을 더 많이 포함한 키(부분 문자열 일치) 먼저, 같으면 Dice 점수 순 — 종목별로 최고 순위 키만
+        for k in keys[np.lexsort((-score, -common[keys]))]:
+            found.setdefault(int(self._key_ids[k]), None)
+            if len(found) >= limit: break
+        return [self.symbols[i] for i in found]
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """접두어 일치 -> 오타/부분 일치 순으로 중복 없이 최대 limit 개"""
+        hit = self.lookup(query)
+        results = ([hit] if hit else []) + self.prefix(query, limit) + self.fuzzy(query, limit)
+        return list(dict.fromkeys(results))[:limit]
+
+def read_symbols(path=None):
+    try:
+        with gzip.open(path or SYMBOLS_FILE, 'rt', encoding='utf-8') as f:
+            return [Symbol(*row[:4]) for row in csv.reader(f, delimiter="\t") if len(row) >= 4]
+    except OSError:
+        return []
+
+def write_symbols(symbols, path=SYMBOLS_FILE):
+    tmp = path + ".tmp"
+    with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=9) as f:
+        writer = csv.writer(f, delimiter="\t", lineterminator="\n")
+        writer.writerows(sorted(set(symbols)))
+    os.replace(tmp, path)
+
+_lock = threading.Lock()
+_index = None
+
+def get(extra=None):
+    """프로세스 공용 색인 (첫 호출 때 SYMBOLS_FILE 을 읽음). extra={이름: 티커} 는 같은 티커 항목보다 우선"""
+    global _index
+    with _lock:
+        if _index is None:
+            listed = read_symbols()
+            by_ticker = {s.ticker.upper(): s for s in listed}
+            featured = []
+            for name, t in (extra or {}).items():
+                known = by_ticker.get(t.upper())
+                featured.append(Symbol(t, name, known.name_en if known else "", known.market if known else ""))
+            _index = SymbolIndex(listed + featured)
+        return _index
+
+# --- 색인 파일 빌더 (상장 목록 파일 -> SYMBOLS_FILE) ---
+
+def parse_krx(text):
+    """KRX 정보데이터시스템 '전종목 기본정보' CSV (단축코드, 한글 종목약명, 영문 종목명, 시장구분)"""
+    out = []
+    for row in csv.DictReader(io.StringIO(text)):
+        suffix = KRX_SUFFIX.get(str(row.get("시장구분", "")).strip())
+        code = str(row.get("단축코드", "")).strip().zfill(6)
+        if suffix and code.strip("0"):
+            name = row.get("한글 종목약명") or row.get("한글 종목명") or ""
+            out.append(Symbol(code + suffix, name.strip(), (row.get("영문 종목명") or "").strip(), row["시장구분"].strip()))
+    return out
+
+def parse_us(text, symbol_col, exchange_col=None):
+    """nasdaqtrader.com 심볼 목록 (| 구분, 마지막 줄은 생성 시각). 테스트 종목 제외"""
+    out = []
+    exchanges = {"A": "NYSE American", "N": "NYSE", "P": "NYSE Arca", "Z": "Cboe BZX", "V": "IEX"}
+    for row in csv.DictReader(io.StringIO(text), delimiter="|"):
+        symbol = (row.get(symbol_col) or "").strip()
+        if not symbol or symbol.startswith("File Creation Time") or row.get("Test Issue") == "Y":
+            continue
+        market = exchanges.get(row.get(exchange_col, ""), "") if exchange_col else "NASDAQ"
+        # 야후 표기: BRK.B -> BRK-B
+        out.append(Symbol(symbol.replace(".", "-"), row["Security Name"].split(" - ")[0].strip(), row["Security Name"].strip(), market))
+    return out
+
+def _read_text(path):
+    raw = open(path, 'rb').read()
+    for enc in ("utf-8-sig", "cp949"):
+        try: return raw.decode(enc)
+        except UnicodeDecodeError: pass
+    return raw.decode("utf-8", errors="replace")
+
+def main():
+    parser = argparse.ArgumentParser(description="종목 검색 색인 파일 만들기")
+    parser.add_argument("--krx", nargs="*", default=[], help="KRX 전종목 기본정보 CSV (유가증권/코스닥)")
+    parser.add_argument("--nasdaq", help="nasdaqlisted.txt")
+    parser.add_argument("--other", help="otherlisted.txt (NYSE 등)")
+    parser.add_argument("--download-us", action="store_true", help="(온라인) 미국 목록을 nasdaqtrader.com 에서 받음")
+    parser.add_argument("--out", default=SYMBOLS_FILE)
+    args = parser.parse_args()
+
+    symbols = []
+    for path in args.krx:
+        symbols += parse_krx(_read_text(path))
+    us = {"nasdaq": args.nasdaq, "other": args.other}
+    for kind, path in us.items():
+        if args.download_us:
+            with urllib.request.urlopen(US_LISTS[kind], timeout=30) as resp:
+                text = resp.read().decode("utf-8", errors="replace")
+        elif path:
+            text = _read_text(path)
+        else:
+            continue
+        symbols += parse_us(text, "Symbol", None) if kind == "nasdaq" else parse_us(text, "ACT Symbol", "Exchange")
+    write_symbols(symbols, args.out)
+    print(f"{len(set(symbols)):,}개 종목 -> {args.out}")
+
+if __name__ == "__main__":
+    main()
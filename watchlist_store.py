@@ -0,0 +1,156 @@
+# 관심종목 목록 저장소 (여러 개의 이름 붙은 목록)
+# - SQLite(WAL) 한 파일에 (목록, 종목 이름) 한 행씩 보관. 추가/수정/삭제는 해당 행만 바꾸고 파일 전체를 다시 쓰지 않음
+# - 순서는 실수형 정렬 키(pos)로 관리: 이동은 움직이는 묶음 옆 이웃 한 행의 pos 만 두 키의 중간값으로 바꿈 (O(k))
+# - 쓰기는 BEGIN IMMEDIATE 트랜잭션이라 여러 세션이 동시에 눌러도 순서대로 적용되고, 읽기는 쓰기 중에도 막히지 않음
+# - 예전 my_tickers.json 은 저장소가 비어 있을 때 한 번만 기본 목록으로 가져옴 (파일은 그대로 둠)
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+WATCHLIST_DB = os.environ.get("WATCHLIST_DB", "watchlists.sqlite")
+LEGACY_FILE = "my_tickers.json"
+DEFAULT_LIST = "기본"
+MIN_GAP = 1e-9 # 이웃 정렬 키 간격이 이보다 좁아지면 목록 전체 pos 를 1, 2, 3... 으로 다시 매김
+SQL_CHUNK = 500
+
+_ready = set()
+
+def connect():
+    con = sqlite3.connect(WATCHLIST_DB, timeout=30, isolation_level=None) # 트랜잭션은 _write 에서 직접 시작
+    if WATCHLIST_DB not in _ready:
+        con.execute("PRAGMA journal_mode=WAL")
+        con.executescript("""
+            CREATE TABLE IF NOT EXISTS lists (
+                name TEXT PRIMARY KEY, created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                list TEXT NOT NULL, name TEXT NOT NULL, ticker TEXT NOT NULL, pos REAL NOT NULL,
+                PRIMARY KEY (list, name)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS items_order ON items (list, pos);
+        """)
+        _ready.add(WATCHLIST_DB)
+    return con
+
+@contextmanager
+def _read():
+    con = connect()
+    try:
+        yield con
+    finally:
+        con.close()
+
+@contextmanager
+def _write():
+    """쓰기 잠금을 먼저 잡는 트랜잭션 (동시 쓰기는 busy timeout 동안 대기 후 순서대로 적용)"""
+    con = connect()
+    try:
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            yield con
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK")
+            raise
+    finally:
+        con.close()
+
+def _marks(n):
+    return ",".join("?" * n)
+
+def ensure_default(default_items):
+    """목록이 하나도 없으면 기본 목록을 만들고 my_tickers.json(없으면 default_items) 을 가져옴"""
+    with _write() as con:
+        if con.execute("SELECT 1 FROM lists LIMIT 1").fetchone():
+            return
+        items = default_items
+        if os.path.exists(LEGACY_FILE):
+            try:
+                with open(LEGACY_FILE, 'r', encoding='utf-8') as f:
+                    items = json.load(f)
+            except (OSError, ValueError):
+                pass
+        con.execute("INSERT INTO lists (name, created) VALUES (?, ?)", (DEFAULT_LIST, time.time()))
+        con.executemany("INSERT INTO items (list, name, ticker, pos) VALUES (?, ?, ?, ?)",
+                        [(DEFAULT_LIST, n, t, float(i)) for i, (n, t) in enumerate(items.items(), 1)])
+
+def lists():
+    with _read() as con:
+        return [r[0] for r in con.execute("SELECT name FROM lists ORDER BY created, name")]
+
+def create_list(name):
+    with _write() as con:
+        con.execute("INSERT OR IGNORE INTO lists (name, created) VALUES (?, ?)", (name, time.time()))
+
+def delete_list(name):
+    with _write() as con:
+        con.execute("DELETE FROM items WHERE list = ?", (name,))
+        con.execute("DELETE FROM lists WHERE name = ?", (name,))
+
+def load(list_name):
+    """{종목 이름: 티커}, 정렬 키 순서"""
+    with _read() as con:
+        return dict(con.execute("SELECT name, ticker FROM items WHERE list = ? ORDER BY pos", (list_name,)))
+
+def upsert(list_name, name, ticker):
+    """이미 있는 이름이면 티커만 바꾸고(자리 유지), 없으면 맨 뒤에 추가"""
+    with _write() as con:
+        con.execute("""
+            INSERT INTO items (list, name, ticker, pos)
+            VALUES (?, ?, ?, (SELECT COALESCE(MAX(pos), 0) + 1 FROM items WHERE list = ?))
+            ON CONFLICT (list, name) DO UPDATE SET ticker = excluded.ticker
+        """, (list_name, name, ticker, list_name))
+
+def remove(list_name, names):
+    names = list(names)
+    with _write() as con:
+        for i in range(0, len(names), SQL_CHUNK):
+            chunk = names[i:i + SQL_CHUNK]
+            con.execute(f"DELETE FROM items WHERE list = ? AND name IN ({_marks(len(chunk))})", (list_name, *chunk))
+
+def _neighbor(con, list_name, pos, direction):
+    """pos 바로 위(-1)/아래(+1) 행 (name, pos), 없으면 None"""
+    if direction < 0:
+        sql = "SELECT name, pos FROM items WHERE list = ? AND pos < ? ORDER BY pos DESC LIMIT 1"
+    else:
+        sql = "SELECT name, pos FROM items WHERE list = ? AND pos > ? ORDER BY pos LIMIT 1"
+    return con.execute(sql, (list_name, pos)).fetchone()
+
+def _renumber(con, list_name):
+    rows = con.execute("SELECT name FROM items WHERE list = ? ORDER BY pos", (list_name,)).fetchall()
+    con.executemany("UPDATE items SET pos = ? WHERE list = ? AND name = ?", [(float(i), list_name, n) for i, (n,) in enumerate(rows, 1)])
+
+def move(list_name, names, direction):
+    """선택한 종목들을 한 칸 위("up")/아래("down")로. 연속된 선택 묶음은 함께 움직이고,
+    묶음 바로 바깥의 이웃 한 행만 묶음 반대편으로 옮김 — 선택 k 개에 대해 인덱스 조회 O(k), 쓰기는 묶음 수만큼"""
+    step = -1 if direction == "up" else 1
+    with _write() as con:
+        for _ in range(2): # 정렬 키 간격이 바닥나면 다시 매긴 뒤 한 번 더
+            chosen = {}
+            names = list(names)
+            for i in range(0, len(names), SQL_CHUNK):
+                chunk = names[i:i + SQL_CHUNK]
+                chosen.update(con.execute(f"SELECT name, pos FROM items WHERE list = ? AND name IN ({_marks(len(chunk))})", (list_name, *chunk)))
+            # 이동 방향 쪽 이웃이 선택되지 않은 행 = 묶음의 앞머리. 이웃을 묶음 반대쪽 끝 너머로 보냄
+            updates = []
+            for name, pos in chosen.items():
+                ahead = _neighbor(con, list_name, pos, step)
+                if ahead is None or ahead[0] in chosen:
+                    continue
+                tail = pos # 묶음의 반대쪽 끝 찾기
+                while True:
+                    behind = _neighbor(con, list_name, tail, -step)
+                    if behind is None or behind[0] not in chosen: break
+                    tail = behind[1]
+                beyond = behind[1] if behind else tail - step
+                new_pos = (tail + beyond) / 2
+                if abs(tail - beyond) < MIN_GAP:
+                    updates = None
+                    break
+                updates.append((new_pos, list_name, ahead[0]))
+            if updates is not None:
+                con.executemany("UPDATE items SET pos = ? WHERE list = ? AND name = ?", updates)
+                return
+            _renumber(con, list_name)